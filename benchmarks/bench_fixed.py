@@ -0,0 +1,61 @@
+"""
+Throughput benchmarks for the fixed_policy package.
+Run through benchmarks/run.py to save results and compare them against a baseline.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixed_policy"))
+
+from harness import Benchmark, run
+from Agent import Agent
+from Dealer import Dealer
+from Shoe import Shoe
+from Sweep import CutoffSweep
+from Table import Table
+
+def benchmarks():
+    random.seed(0)
+
+    # Shoe: ten draws per call, refilled in between as Table.reset does
+    shoe = Shoe()
+    def draw_cards():
+        for _ in range(10):
+            shoe.drawCard()
+        shoe.reset()
+
+    agent = Agent()
+    for card in ['A', '5', '7']:
+        agent.receiveCard(card)
+
+    dealer_shoe = Shoe()
+    dealer = Dealer(dealer_shoe)
+    def dealer_turn():
+        dealer.drawInitial()
+        dealer.playTurn()
+        dealer.reset()
+        dealer_shoe.reset()
+
+    table_shoe = Shoe()
+    table = Table(table_shoe, Dealer(table_shoe))
+    table.add(Agent())
+    def play_episode():
+        table.dealInitial()
+        table.playEpisode()
+        table.reset()
+
+    # One hand played under each of the ten cutoffs 12-21
+    sweep_shoe = Shoe()
+    sweep = CutoffSweep(sweep_shoe, Dealer(sweep_shoe))
+
+    return [
+        Benchmark("shoe.drawCard", draw_cards, 10, "cards"),
+        Benchmark("agent.calculateHand", agent.calculateHand),
+        Benchmark("dealer.playTurn", dealer_turn, 1, "hands"),
+        Benchmark("table.playEpisode", play_episode, 1, "hands"),
+        Benchmark("sweep.playHand", sweep.playHand, len(sweep.cutoffs), "hands"),
+    ]
+
+if __name__ == "__main__":
+    run(benchmarks(), "fixed")
@@ -0,0 +1,128 @@
+"""
+Throughput benchmarks for the rl_blackjack package.
+Run through benchmarks/run.py to save results and compare them against a baseline.
+"""
+import os
+import random
+import sys
+import tempfile
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rl_blackjack"))
+
+from harness import Benchmark, run
+from Actions import Action
+from Agent import Agent
+from BatchTable import BatchTable
+from Cards import CARD_NAMES
+from Dealer import Dealer
+from MonteCarlo import MonteCarlo, PAIR_KEY
+from Rng import BufferedRandom
+from Shoe import Shoe
+from Table import Table
+
+BATCH_SIZE = 10000
+UPDATES = 1000
+TABLE_HANDS = 100 # Hands per table.playEpisode call, with their queued rewards flushed at the end
+
+def trained_policy() -> MonteCarlo:
+    """
+    A policy with every reachable state visited, as after a normal training run.
+    """
+    policy = MonteCarlo(rng=BufferedRandom(0))
+    batch = BatchTable(Shoe(), policy, seed=0)
+    for _ in range(5):
+        policy.update_actions(0.05)
+        batch.updatePolicy(batch.playEpisodes(20000))
+    policy.update_actions(0.05)
+    return policy
+
+def benchmarks():
+    random.seed(0)
+    policy = trained_policy()
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "bench")
+    policy.save(filename)
+    policy.save_binary(filename)
+
+    rng = BufferedRandom(0)
+    def draw_random():
+        for _ in range(1000):
+            rng.random()
+
+    # Shoe: ten draws per call, refilled in between as Table.reset does
+    shoe = Shoe(rng=BufferedRandom(1))
+    def draw_cards():
+        for _ in range(10):
+            shoe.drawCard()
+        shoe.reset()
+
+    persistent_shoe = Shoe(num_decks=6, penetration=0.75, rng=BufferedRandom(2))
+    def draw_cards_persistent():
+        for _ in range(10):
+            persistent_shoe.drawCard()
+        persistent_shoe.reset()
+
+    agent = Agent(policy)
+    for name in ['A', '5', '7']:
+        agent.receiveCard(CARD_NAMES.index(name))
+
+    dealer_shoe = Shoe(rng=BufferedRandom(3))
+    dealer = Dealer(dealer_shoe)
+    def dealer_turn():
+        dealer.drawInitial()
+        dealer.playTurn()
+        dealer.reset()
+        dealer_shoe.reset()
+
+    table_shoe = Shoe(rng=BufferedRandom(4))
+    table = Table(table_shoe, Dealer(table_shoe))
+    table.add(Agent(policy))
+    def play_episode():
+        for _ in range(TABLE_HANDS):
+            table.dealInitial()
+            table.playEpisode()
+            table.reset()
+        policy.flush_updates()
+
+    batch = BatchTable(Shoe(), policy, seed=1)
+    def play_batch():
+        batch.playEpisodes(BATCH_SIZE)
+
+    update_policy = MonteCarlo()
+    states = [((random.randint(4, 21), random.randint(2, 11)), random.choice(list(Action)), random.choice([-1, 0, 1]))
+              for _ in range(UPDATES)]
+    def update():
+        for state, action, reward in states:
+            update_policy.update(state, action, reward)
+
+    # The same updates queued as Agent.rewardUpdate does, with the keys Agent builds during play,
+    # and applied in one grouped flush
+    buffered_policy = MonteCarlo()
+    keyed = [((PAIR_KEY[(state, action)],), reward) for state, action, reward in states]
+    def buffered_update():
+        for keys, reward in keyed:
+            buffered_policy.buffer_keys(keys, reward)
+        buffered_policy.flush_updates()
+
+    return [
+        Benchmark("rng.random", draw_random, 1000, "values"),
+        Benchmark("shoe.drawCard", draw_cards, 10, "cards"),
+        Benchmark("shoe.drawCard_persistent", draw_cards_persistent, 10, "cards"),
+        Benchmark("agent.calculateHand", agent.calculateHand),
+        Benchmark("dealer.playTurn", dealer_turn, 1, "hands"),
+        Benchmark("table.playEpisode", play_episode, TABLE_HANDS, "hands"),
+        Benchmark("batch.playEpisodes", play_batch, BATCH_SIZE, "hands"),
+        Benchmark("montecarlo.update", update, UPDATES, "updates"),
+        Benchmark("montecarlo.buffer_keys", buffered_update, UPDATES, "updates"),
+        Benchmark("montecarlo.update_actions", lambda: policy.update_actions(0.05)),
+        Benchmark("montecarlo.save", lambda: policy.save(filename)),
+        Benchmark("montecarlo.load", lambda: MonteCarlo().load(filename)),
+        Benchmark("montecarlo.save_binary", lambda: policy.save_binary(filename)),
+        Benchmark("montecarlo.load_binary", lambda: MonteCarlo().load_binary(filename)),
+    ]
+
+if __name__ == "__main__":
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        suite = benchmarks()
+    run(suite, "rl")
@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import time
+from contextlib import redirect_stdout
+from typing import Callable, Dict, List
+
+class Benchmark:
+    """
+    A named piece of work to time. Each call to func does `units` units of work
+    (hands, cards, updates...), so throughput is reported per unit rather than per call.
+    """
+    def __init__(self, name: str, func: Callable[[], None], units: int = 1, unit: str = "calls", setup: Callable[[], None] = None):
+        self.name = name
+        self.func = func
+        self.units = units
+        self.unit = unit
+        self.setup = setup
+
+def measure(benchmark: Benchmark, min_time: float = 0.2, repeat: int = 3) -> Dict[str, float]:
+    """
+    Time a benchmark and return its best per-unit latency and throughput over `repeat` rounds.
+    Each round runs for at least min_time seconds.
+    """
+    if benchmark.setup:
+        benchmark.setup()
+    func = benchmark.func
+    func() # Warm up
+
+    # Find a call count that takes roughly min_time
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        calls *= 2
+
+    best = elapsed / calls
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - start) / calls)
+
+    per_unit = best / benchmark.units
+    return {
+        "unit": benchmark.unit,
+        "latency_us": per_unit * 1e6,
+        "per_second": 1 / per_unit,
+    }
+
+def run(benchmarks: List[Benchmark], prefix: str) -> Dict[str, Dict[str, float]]:
+    """
+    Command-line entry point for a benchmark module. Measures every benchmark (or those whose
+    name contains --only), prints a summary and writes the results, keyed by prefix.name,
+    as JSON to --json.
+    """
+    parser = argparse.ArgumentParser(description=f"Run the {prefix} benchmarks.")
+    parser.add_argument("--json", type=str, help="File to write the results to.")
+    parser.add_argument("--only", type=str, help="Only run benchmarks whose name contains this string.")
+    args = parser.parse_args()
+
+    results = {}
+    for benchmark in benchmarks:
+        name = f"{prefix}.{benchmark.name}"
+        if args.only and args.only not in name:
+            continue
+        # Keep progress messages from the code under test (e.g. "Policy saved to...") out of the output
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            results[name] = measure(benchmark)
+        print(f"{name}: {results[name]['per_second']:,.0f} {benchmark.unit}/s "
+              f"({results[name]['latency_us']:.2f} us each)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
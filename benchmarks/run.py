@@ -0,0 +1,111 @@
+"""
+Run the benchmark suites and compare them against a stored baseline.
+
+The rl_blackjack and fixed_policy packages use the same module names (Shoe, Agent...),
+so each suite runs in its own process.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+
+Exits with status 1 if any benchmark's throughput falls more than --threshold below the baseline,
+or if a fast path loses its speedup over the path it replaces (see SPEEDUPS). The speedups are
+measured within the run, so they are checked on every run, with or without a baseline.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict
+
+SUITES = ["bench_rl.py", "bench_fixed.py"]
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# (fast path, reference path, minimum throughput ratio). The minimums sit well below the measured
+# ratios (about 4x, 16x, 4x, 3x and 7x), so only a real regression of the fast path trips them.
+SPEEDUPS = [
+    ("rl.montecarlo.buffer_keys", "rl.montecarlo.update", 2),
+    ("rl.batch.playEpisodes", "rl.table.playEpisode", 5),
+    ("rl.montecarlo.save_binary", "rl.montecarlo.save", 2),
+    ("rl.montecarlo.load_binary", "rl.montecarlo.load", 1.5),
+    ("fixed.sweep.playHand", "fixed.table.playEpisode", 3),
+]
+
+def run_suites(only: str = None) -> Dict[str, Dict[str, float]]:
+    """
+    Run every suite in a subprocess and collect their results.
+    """
+    results = {}
+    for suite in SUITES:
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            command = [sys.executable, os.path.join(DIRECTORY, suite), "--json", output.name]
+            if only:
+                command += ["--only", only]
+            subprocess.run(command, check=True)
+            with open(output.name) as f:
+                results.update(json.load(f))
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> bool:
+    """
+    Print the change in throughput of every benchmark present in both result sets.
+    :return: True if none regressed by more than threshold (a fraction, e.g. 0.2 for 20%).
+    """
+    passed = True
+    print("\n===== Comparison with baseline =====")
+    for name, result in results.items():
+        if name not in baseline:
+            print(f"{name}: no baseline")
+            continue
+        change = result["per_second"] / baseline[name]["per_second"] - 1
+        status = "ok"
+        if change < -threshold:
+            status = "REGRESSION"
+            passed = False
+        print(f"{name}: {change*100:+.1f}% {status}")
+    return passed
+
+def check_speedups(results: Dict[str, Dict[str, float]]) -> bool:
+    """
+    Print the speedup of every fast path in SPEEDUPS over its reference, where both were run.
+    :return: True if every speedup is at least its minimum.
+    """
+    passed = True
+    print("\n===== Speedups =====")
+    for fast, reference, minimum in SPEEDUPS:
+        if fast not in results or reference not in results:
+            continue
+        ratio = results[fast]["per_second"] / results[reference]["per_second"]
+        status = "ok"
+        if ratio < minimum:
+            status = f"REGRESSION (below {minimum}x)"
+            passed = False
+        print(f"{fast} vs {reference}: {ratio:.1f}x {status}")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the throughput benchmarks.")
+    parser.add_argument("--output", type=str, help="File to write the results to, as JSON.")
+    parser.add_argument("--baseline", type=str, help="Baseline results to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed throughput drop before failing. Default 0.2 (20%%).")
+    parser.add_argument("--save-baseline", type=str, help="Store the results as a new baseline.")
+    parser.add_argument("--only", type=str, help="Only run benchmarks whose name contains this string.")
+    args = parser.parse_args()
+
+    results = run_suites(args.only)
+
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Results saved to {path}")
+
+    passed = check_speedups(results)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        passed = compare(results, baseline, args.threshold) and passed
+    if not passed:
+        sys.exit(1)
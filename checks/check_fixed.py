@@ -0,0 +1,78 @@
+"""
+Correctness checks for the fixed_policy package.
+Run directly, or through checks/run.py with the other suites.
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "fixed_policy"))
+
+from harness import Check, run
+from Agent import Agent
+from Dealer import Dealer
+from Shoe import Shoe
+from Solver import solve_state_values
+from Sweep import CutoffSweep
+from Table import Table
+
+SOLVER_HANDS = 100000
+SWEEP_HANDS = 20000
+
+def play_table(agent: Agent, episodes: int, num_decks: int = 1) -> Agent:
+    """
+    Play the given number of hands with one agent at a Table.
+    """
+    shoe = Shoe(num_decks=num_decks)
+    table = Table(shoe, Dealer(shoe))
+    table.add(agent)
+    for _ in range(episodes):
+        table.dealInitial()
+        table.playEpisode()
+        table.reset()
+    return agent
+
+def solver_matches_simulation() -> str:
+    """
+    Every state visited at least 100 times in a Table run on a shoe of many decks (close to the
+    solver's infinite shoe) is within a few standard errors of its exact value. A standard error
+    is taken as 1/sqrt(visits), which bounds it for rewards between -1 and 1.
+    """
+    random.seed(0)
+    agent = play_table(Agent(cutoff=20), SOLVER_HANDS, num_decks=1000)
+    exact = solve_state_values(agent.policy.cutoff, agent.win_reward, agent.loss_reward, agent.draw_reward)
+    simulated = agent.policy.state_values
+    counts = agent.policy.state_counts
+    missing = [key for key in simulated if key[0] <= 21 and key[1] <= 11 and key not in exact]
+    assert not missing, f"simulated states without an exact value: {missing}"
+    compared = [key for key in exact if counts.get(key, 0) >= 100]
+    errors = {key: abs(simulated[key] - exact[key]) * counts[key] ** 0.5 for key in compared}
+    mean = sum(errors.values()) / len(errors)
+    worst = max(errors, key=errors.get)
+    assert mean < 1, f"mean difference of {mean:.2f} standard errors"
+    assert errors[worst] < 4, f"{errors[worst]:.2f} standard errors at {worst} " \
+                              f"(simulated {simulated[worst]:+.3f}, exact {exact[worst]:+.3f})"
+    return f"{len(compared)} states, mean {mean:.2f} and largest {errors[worst]:.2f} standard errors"
+
+def sweep_matches_table() -> str:
+    """
+    A single-cutoff sweep draws its cards in Table's order, so on the same random seed it records
+    exactly the state values and visit counts of a Table run with Agent(cutoff).
+    """
+    for cutoff in (12, 17, 20, 21):
+        random.seed(cutoff)
+        agent = play_table(Agent(cutoff=cutoff), SWEEP_HANDS)
+        random.seed(cutoff)
+        shoe = Shoe()
+        sweep = CutoffSweep(shoe, Dealer(shoe), [cutoff])
+        sweep.run(SWEEP_HANDS)
+        policy = sweep.policies[cutoff]
+        assert policy.state_counts == agent.policy.state_counts, f"visit counts differ for cutoff {cutoff}"
+        assert policy.state_values == agent.policy.state_values, f"state values differ for cutoff {cutoff}"
+    return f"cutoffs 12, 17, 20 and 21 over {SWEEP_HANDS} hands"
+
+if __name__ == "__main__":
+    run([
+        Check("solver.matches_simulation", solver_matches_simulation),
+        Check("sweep.matches_table", sweep_matches_table),
+    ], "fixed")
@@ -0,0 +1,96 @@
+"""
+Correctness checks for the rl_blackjack package.
+Run directly, or through checks/run.py with the other suites.
+"""
+import os
+import sys
+import numpy as np
+from multiprocessing import Pool
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "rl_blackjack"))
+
+from harness import Check, run
+from Agent import Agent
+from Dealer import Dealer
+from MonteCarlo import MonteCarlo
+from Parallel import play_generation
+from Rng import BufferedRandom
+from Shoe import Shoe
+from Table import Table
+
+class SequentialAgent(Agent):
+    """
+    Agent that applies every reward at once, one update per (state, action) pair, as
+    rewardUpdate did before rewards were queued.
+    """
+    def rewardUpdate(self, reward: int) -> None:
+        for state, action in zip(self.states, self.stateActions):
+            self.policy.update(state, action, reward)
+
+def train_serial(agent_type: type, seed: int, generations: int = 4, episodes: int = 5000, seats: int = 2) -> MonteCarlo:
+    """
+    Train a policy at one table, unchunked, with seats of the given Agent class.
+    """
+    shoe_rng, policy_rng = BufferedRandom(seed).spawn(2)
+    shoe = Shoe(2, 0.75, rng=shoe_rng)
+    table = Table(shoe, Dealer(shoe))
+    policy = MonteCarlo(rng=policy_rng)
+    for _ in range(seats):
+        table.add(agent_type(policy))
+    for _ in range(generations):
+        policy.update_actions(0.2)
+        for _ in range(episodes):
+            table.dealInitial()
+            table.playEpisode()
+            table.reset()
+    policy.flush_updates()
+    return policy
+
+def buffered_updates() -> str:
+    """
+    Queued rewards, applied in grouped flushes, give the averages of one update per reward.
+    """
+    buffered = train_serial(Agent, seed=3)
+    sequential = train_serial(SequentialAgent, seed=3)
+    assert np.array_equal(buffered.counts, sequential.counts), "visit counts differ"
+    assert np.allclose(buffered.values, sequential.values, rtol=0, atol=1e-9), \
+        f"values differ by up to {np.abs(buffered.values - sequential.values).max():.3g}"
+    assert np.array_equal(buffered.action_table, sequential.action_table), "on-policy actions differ"
+    return f"{int(buffered.counts.sum())} updates match"
+
+def train_chunked(workers: int, seed: int = 5, generations: int = 2, episodes: int = 25000) -> tuple:
+    """
+    Train in seeded chunks on the given number of worker processes (0 for none).
+    :return: Tuple of (policy, outcomes of every generation).
+    """
+    policy = MonteCarlo(rng=BufferedRandom(seed).spawn(2)[1])
+    pool = Pool(workers) if workers else None
+    outcomes = []
+    try:
+        for generation in range(generations):
+            policy.update_actions(0.2)
+            outcomes.append(play_generation(pool, policy, episodes, seed, generation, 2, 0.75, seats=2))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return policy, outcomes
+
+def worker_counts() -> str:
+    """
+    Seeded training gives byte-identical policies in one process and on any number of workers.
+    """
+    serial, serial_outcomes = train_chunked(0)
+    for workers in (1, 3):
+        policy, outcomes = train_chunked(workers)
+        assert outcomes == serial_outcomes, f"outcomes with {workers} workers differ: {outcomes} != {serial_outcomes}"
+        for name in ('counts', 'values', 'action_table'):
+            assert getattr(policy, name).tobytes() == getattr(serial, name).tobytes(), \
+                f"{name} with {workers} workers differ from the serial run"
+    return "serial, 1 and 3 workers"
+
+if __name__ == "__main__":
+    run([
+        Check("montecarlo.buffered_updates", buffered_updates),
+        Check("parallel.worker_counts", worker_counts),
+    ], "rl")
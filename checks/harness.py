@@ -0,0 +1,41 @@
+import argparse
+import os
+import time
+from contextlib import redirect_stdout
+from typing import Callable, List
+
+class Check:
+    """
+    A named correctness check. func raises AssertionError when the check fails, and otherwise
+    returns a one-line summary of what it compared.
+    """
+    def __init__(self, name: str, func: Callable[[], str]):
+        self.name = name
+        self.func = func
+
+def run(checks: List[Check], prefix: str) -> None:
+    """
+    Command-line entry point for a check module. Runs every check (or those whose name contains
+    --only), prints its result and exits with status 1 if any failed.
+    """
+    parser = argparse.ArgumentParser(description=f"Run the {prefix} checks.")
+    parser.add_argument("--only", type=str, help="Only run checks whose name contains this string.")
+    args = parser.parse_args()
+
+    passed = True
+    for check in checks:
+        name = f"{prefix}.{check.name}"
+        if args.only and args.only not in name:
+            continue
+        start = time.perf_counter()
+        try:
+            # Keep progress messages from the code under test out of the output
+            with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+                summary = check.func()
+        except AssertionError as error:
+            passed = False
+            print(f"{name}: FAILED: {error}")
+            continue
+        print(f"{name}: ok ({summary}, {time.perf_counter() - start:.1f}s)")
+    if not passed:
+        raise SystemExit(1)
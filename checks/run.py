@@ -0,0 +1,32 @@
+"""
+Run the correctness checks of both packages.
+
+The rl_blackjack and fixed_policy packages use the same module names (Shoe, Agent...),
+so each suite runs in its own process, as the benchmarks do.
+
+    python checks/run.py
+    python checks/run.py --only solver
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SUITES = ["check_rl.py", "check_fixed.py"]
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the correctness checks.")
+    parser.add_argument("--only", type=str, help="Only run checks whose name contains this string.")
+    args = parser.parse_args()
+
+    failed = False
+    for suite in SUITES:
+        command = [sys.executable, os.path.join(DIRECTORY, suite)]
+        if args.only:
+            command += ["--only", args.only]
+        failed |= subprocess.run(command).returncode != 0
+    if failed:
+        sys.exit(1)
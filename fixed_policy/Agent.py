@@ -1,12 +1,16 @@
-from typing import Tuple
+from typing import List, Set, Tuple
 from Actions import Action
 from Policy import Policy
 
 class Agent:
+    __slots__ = ('policy', 'hand', 'states', 'visited', 'usable_ace', 'win_reward', 'loss_reward', 'draw_reward')
+
     def __init__(self, cutoff: int = 20, win_reward: int = 1, loss_reward: int = -1, draw_reward: int = 0):
         self.policy = Policy(cutoff)
         self.hand = []
-        self.states = []
+        # Trajectory buffers, cleared in place by reset
+        self.states: List[Tuple[int,int,bool]] = []
+        self.visited: Set[Tuple[int,int,bool]] = set() # Same states as self.states, for O(1) first-visit checks
         self.usable_ace = False
         self.win_reward = win_reward
         self.loss_reward = loss_reward
@@ -45,7 +49,8 @@ class Agent:
         current_hand = self.calculateHand()
         usable_ace = self.usable_ace
         state = (current_hand, dealer_hand, usable_ace)
-        if state not in self.states:
+        if state not in self.visited:
+            self.visited.add(state)
             self.states.append(state)
 
     def rewardUpdate(self, reward: int) -> None:
@@ -64,8 +69,9 @@ class Agent:
         """
         Clear the Agent's hand and reset parameters for a new episode.
         """
-        self.hand = []
-        self.states = []
+        self.hand.clear()
+        self.states.clear()
+        self.visited.clear()
         self.usable_ace = False
 
                 
@@ -2,6 +2,8 @@ from Agent import Agent
 from Shoe import Shoe
 
 class Dealer:
+    __slots__ = ('hand', 'shoe')
+
     def __init__(self, shoe: Shoe):
         """
         Initialize the dealer with an empty hand and a shoe of cards to draw from.
@@ -17,7 +19,9 @@ class Dealer:
 
         :return: A list containing the dealer's two initial cards.
         """
-        self.hand = [self.shoe.drawCard(), self.shoe.drawCard()]  # Dealer starts with two cards
+        self.hand.clear()
+        self.hand.append(self.shoe.drawCard())  # Dealer starts with two cards
+        self.hand.append(self.shoe.drawCard())
         return self.hand
 
     def draw(self) -> None:
@@ -82,7 +86,7 @@ class Dealer:
         """
         Reset the dealer's hand, clearing all cards for the next round.
         """
-        self.hand = []  # Empty the dealer's hand to prepare for a new round
+        self.hand.clear()  # Empty the dealer's hand to prepare for a new round
 
     def deal(self, agent: Agent) -> None:
         """
@@ -4,6 +4,7 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 from PIL import Image
+from Solver import solve_state_values
 
 
 class Policy:
@@ -40,6 +41,17 @@ class Policy:
             self.state_values[state] = reward
             self.state_counts[state] = 1
 
+    def solveStateValues(self, win_reward: float = 1, loss_reward: float = -1, draw_reward: float = 0) -> Dict[Tuple[int,int,bool],float]:
+        """
+        Replace state_values with the exact values of this policy's cutoff rule (see Solver.solve_state_values),
+        under the same keys and rules as the simulated estimates. They are exact for an infinite shoe, so
+        a one-deck simulation still differs slightly through the cards already dealt.
+        """
+        self.state_values = solve_state_values(self.cutoff, win_reward, loss_reward, draw_reward)
+        # Exact values carry no visits. A later update() starts a fresh average from its reward.
+        self.state_counts = {state: 0 for state in self.state_values}
+        return self.state_values
+
     def stateValuePlot(self, usable_ace_p: bool, save_path = None):
 
         # Filter states based on usable_ace_p
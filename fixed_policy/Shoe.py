@@ -20,6 +20,7 @@ class Shoe:
     isEmpty() -> bool:
         Checks if the shoe is empty (i.e., no cards left).
     """
+    __slots__ = ('num_decks', 'deck', 'full_deck')
     
     def __init__(self, num_decks: int = 1):
         """
@@ -32,7 +33,8 @@ class Shoe:
         """
         # Initialize the deck with the specified number of decks
         self.num_decks = num_decks
-        self.deck = self.createDeck(self.num_decks)
+        self.full_deck = self.createDeck(self.num_decks) # Copied back into self.deck by reset
+        self.deck = dict(self.full_deck)
 
     def createDeck(self, num_decks: int) -> dict[str, int]:
         """
@@ -111,7 +113,7 @@ class Shoe:
         """
         Resets to the original settings
         """
-        self.deck = self.createDeck(self.num_decks)
+        self.deck.update(self.full_deck)
         
 
 
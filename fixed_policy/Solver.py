@@ -0,0 +1,201 @@
+from functools import lru_cache
+from typing import Dict, Tuple
+
+# Probability of drawing each card value from an infinitely large shoe.
+# 10 covers ten, jack, queen and king; aces are drawn as 11.
+CARD_PROBABILITIES: Dict[int, float] = {value: 1 / 13 for value in range(2, 10)}
+CARD_PROBABILITIES[10] = 4 / 13
+CARD_PROBABILITIES[11] = 1 / 13
+
+BUST = 22 # Any final total over 21
+
+# The dealer_hand of a state for each upcard value. Dealer.calculateHand(True) reads the '10' card
+# as the characters '1' and '0', so Agent records a ten-valued upcard as 1.
+UPCARD_KEYS: Dict[int, int] = {value: 1 if value == 10 else value for value in CARD_PROBABILITIES}
+
+def add_card(value: int, soft: bool, card: int) -> Tuple[int, bool]:
+    """
+    Add a card to a hand, counting an ace as 11 only while that doesn't bust.
+    :param value: Current hand value.
+    :param soft: Whether the hand currently counts an ace as 11.
+    :param card: Value of the new card (11 for an ace).
+    :return: The new (value, soft) pair. Values over 21 are busts.
+    """
+    if card == 11:
+        if soft or value + 11 > 21:
+            card = 1
+        else:
+            soft = True
+    value += card
+    if value > 21 and soft:
+        value -= 10
+        soft = False
+    return value, soft
+
+@lru_cache(maxsize=None)
+def dealer_distribution(value: int, soft: bool) -> Dict[int, float]:
+    """
+    Distribution of the dealer's final total from the given hand, drawing below 17 as Dealer.playTurn does.
+    :return: Dict mapping final totals (17-21, or BUST) to probabilities.
+    """
+    if value > 21:
+        return {BUST: 1.0}
+    if value >= 17:
+        return {value: 1.0}
+    result: Dict[int, float] = {}
+    for card, probability in CARD_PROBABILITIES.items():
+        for final, p in dealer_distribution(*add_card(value, soft, card)).items():
+            result[final] = result.get(final, 0.0) + probability * p
+    return result
+
+@lru_cache(maxsize=None)
+def dealer_outcomes(upcard: int) -> Tuple[float, Dict[int, float]]:
+    """
+    The dealer's chance of a natural with the given upcard, and the distribution of its final
+    total when it has none. Table checks for a dealer natural before anyone plays, so a dealer
+    that plays on has a hole card that doesn't make 21.
+    :return: Tuple of (natural probability, dict mapping final totals to probabilities).
+    """
+    start = add_card(0, False, upcard)
+    natural = 0.0
+    result: Dict[int, float] = {}
+    for card, probability in CARD_PROBABILITIES.items():
+        value, soft = add_card(*start, card)
+        if value == 21:
+            natural += probability
+            continue
+        for final, p in dealer_distribution(value, soft).items():
+            result[final] = result.get(final, 0.0) + probability * p
+    return natural, {final: p / (1 - natural) for final, p in result.items()}
+
+def solve_state_values(cutoff: int, win_reward: float = 1, loss_reward: float = -1, draw_reward: float = 0) -> Dict[Tuple[int, int, bool], float]:
+    """
+    Exact value of every state under the "hit below cutoff" rule, as Table and Agent estimate it
+    by simulation, from an infinite shoe.
+
+    Follows Table.playEpisode: the initial state is recorded before naturals are checked, a
+    dealer natural ends the hand (a draw against an agent natural, otherwise a loss), an agent
+    natural wins at once, and otherwise the agent hits below the cutoff and the dealer, whose
+    hole card is known not to make a natural, plays out its hand. States use Agent's keys:
+    dealer_hand is the upcard as Agent records it (see UPCARD_KEYS), and usable_ace means an ace
+    in the hand has been counted as 1, so soft hands share their keys with hard hands without
+    an ace. Each key's value is the average over every hand that visits it, as Policy.update
+    takes it, including the second loss Table gives a hand that busts.
+
+    :param cutoff: The agent hits while its hand is below this value.
+    :return: Dict mapping (agent_hand, dealer_hand, usable_ace) to the state's value.
+    """
+    @lru_cache(maxsize=None)
+    def future(hand: int, soft: bool, upcard: int) -> Tuple[float, float]:
+        """
+        Expected (rewards applied, reward updates) per visited state for the rest of a hand with
+        no naturals, from the agent's hand. A bust applies its loss twice.
+        """
+        if hand > 21:
+            return 2 * loss_reward, 2.0
+        if hand >= cutoff:
+            expected = 0.0
+            for final, probability in dealer_outcomes(upcard)[1].items():
+                if final == BUST or hand > final:
+                    expected += probability * win_reward
+                elif hand == final:
+                    expected += probability * draw_reward
+                else:
+                    expected += probability * loss_reward
+            return expected, 1.0
+        rewards = 0.0
+        updates = 0.0
+        for card, probability in CARD_PROBABILITIES.items():
+            card_rewards, card_updates = future(*add_card(hand, soft, card), upcard)
+            rewards += probability * card_rewards
+            updates += probability * card_updates
+        return rewards, updates
+
+    # Expected rewards and updates applied to each key per hand dealt, summed over the hands that
+    # visit it. Their ratio is the average Policy.update converges to.
+    rewards: Dict[Tuple[int, int, bool], float] = {}
+    updates: Dict[Tuple[int, int, bool], float] = {}
+    def visit(key: Tuple[int, int, bool], probability: float, key_rewards: float, key_updates: float) -> None:
+        rewards[key] = rewards.get(key, 0.0) + probability * key_rewards
+        updates[key] = updates.get(key, 0.0) + probability * key_updates
+
+    for upcard in range(2, 12):
+        dealer_natural, _ = dealer_outcomes(upcard)
+        upcard_key = UPCARD_KEYS[upcard]
+        # Probability of each initial (hand, soft, usable_ace)
+        initial: Dict[Tuple[int, bool, bool], float] = {}
+        for first, p_first in CARD_PROBABILITIES.items():
+            for second, p_second in CARD_PROBABILITIES.items():
+                value, soft = add_card(*add_card(0, False, first), second)
+                state = (value, soft, value != first + second)
+                initial[state] = initial.get(state, 0.0) + p_first * p_second
+
+        # Hands still being played after each card, with the probability of getting there
+        playing: Dict[Tuple[int, bool, bool], float] = {}
+        for (hand, soft, usable_ace), probability in initial.items():
+            key = (hand, upcard_key, usable_ace)
+            natural_reward = draw_reward if hand == 21 else loss_reward
+            visit(key, probability * dealer_natural, natural_reward, 1.0)
+            probability *= 1 - dealer_natural
+            if hand == 21:
+                visit(key, probability, win_reward, 1.0)
+                continue
+            visit(key, probability, *future(hand, soft, upcard))
+            if hand < cutoff:
+                playing[(hand, soft, usable_ace)] = probability
+
+        while playing:
+            hitting = playing
+            playing = {}
+            for (hand, soft, usable_ace), probability in hitting.items():
+                for card, p_card in CARD_PROBABILITIES.items():
+                    new_hand, new_soft = add_card(hand, soft, card)
+                    if new_hand > 21:
+                        continue
+                    new_usable_ace = usable_ace or new_hand != hand + card
+                    reached = probability * p_card
+                    # Drawing a ten to a soft hand with an ace already counted as 1 gives the same
+                    # key again, and Agent records each state once per hand.
+                    if (new_hand, new_usable_ace) != (hand, usable_ace):
+                        visit((new_hand, upcard_key, new_usable_ace), reached, *future(new_hand, new_soft, upcard))
+                    if new_hand < cutoff:
+                        state = (new_hand, new_soft, new_usable_ace)
+                        playing[state] = playing.get(state, 0.0) + reached
+
+    return {key: rewards[key] / updates[key] for key in sorted(rewards) if updates[key] > 0}
+
+
+if __name__ == "__main__":
+    import random
+    import sys
+    from Agent import Agent
+    from Dealer import Dealer
+    from Shoe import Shoe
+    from Table import Table
+
+    # Check the solver against a simulation. A shoe of many decks is close to the solver's
+    # infinite shoe, so every key's simulated value should be within a few standard errors of its
+    # exact value, with a standard error of at most 1/sqrt(visits).
+    episodes = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(0)
+    shoe = Shoe(num_decks=1000)
+    table = Table(shoe, Dealer(shoe))
+    agent = Agent(cutoff=20)
+    table.add(agent)
+    for _ in range(episodes):
+        table.dealInitial()
+        table.playEpisode()
+        table.reset()
+
+    exact = solve_state_values(agent.policy.cutoff, agent.win_reward, agent.loss_reward, agent.draw_reward)
+    simulated = agent.policy.state_values
+    counts = agent.policy.state_counts
+    compared = [key for key in exact if counts.get(key, 0) >= 100]
+    errors = {key: abs(simulated[key] - exact[key]) * counts[key] ** 0.5 for key in compared}
+    worst = max(errors, key=errors.get)
+    print(f"{len(compared)} of {len(exact)} states visited at least 100 times in {episodes} hands")
+    print(f"Mean difference: {sum(errors.values()) / len(errors):.2f} standard errors")
+    print(f"Largest difference: {errors[worst]:.2f} standard errors at {worst} "
+          f"(simulated {simulated[worst]:+.3f}, exact {exact[worst]:+.3f}, {counts[worst]} visits)")
+    missing = [key for key in simulated if key[0] <= 21 and key[1] <= 11 and key not in exact]
+    print(f"Simulated states without an exact value: {missing}")
@@ -0,0 +1,165 @@
+from typing import Dict, Iterable, List, Tuple
+from Dealer import Dealer
+from Policy import Policy
+from Shoe import Shoe
+from Solver import UPCARD_KEYS, add_card
+from tqdm import tqdm
+
+# Value of each card, with aces counted as 11 as Solver.add_card expects
+CARD_VALUES: Dict[str, int] = {card: 11 if card == 'A' else int(card) for card in Shoe().deck}
+
+class CutoffSweep:
+    """
+    Compares "hit below X" rules on common random numbers.
+
+    Each hand is dealt once and played out under every cutoff in lockstep: the agent keeps
+    hitting until the largest cutoff would stand, so the hand under a smaller cutoff is a prefix
+    of the same card sequence, and the dealer's play after it is shared. Every cutoff sees exactly
+    the hands a separate Table run would, but the comparison between cutoffs is free of dealing
+    noise.
+
+    States and rewards follow Table.playEpisode and Agent, so each cutoff's state_values are those
+    of a Table run with Agent(cutoff): states are keyed (agent_hand, dealer_hand, usable_ace) with
+    the upcard as Agent records it (see Solver.UPCARD_KEYS) and usable_ace meaning an ace has been
+    counted as 1, each state is recorded once per hand, the hand's last state is also recorded
+    with the dealer's final total, and a bust's loss is applied twice to the states before it.
+    With a single cutoff the sweep draws its cards in Table's order, so the same random seed gives
+    the same state_values.
+    """
+    __slots__ = ('shoe', 'dealer', 'cutoffs', 'policies', 'wins', 'losses', 'draws', 'hands',
+                 'win_reward', 'loss_reward', 'draw_reward', 'trajectory')
+
+    def __init__(self, shoe: Shoe, dealer: Dealer, cutoffs: Iterable[int] = range(12, 22),
+                 win_reward: int = 1, loss_reward: int = -1, draw_reward: int = 0):
+        """
+        :param cutoffs: The cutoffs to compare. Each one hits while its hand is below the cutoff.
+        """
+        self.shoe = shoe
+        self.dealer = dealer
+        self.cutoffs = sorted(cutoffs)
+        # One policy per cutoff, holding that rule's state_values
+        self.policies: Dict[int, Policy] = {cutoff: Policy(cutoff) for cutoff in self.cutoffs}
+        self.wins: Dict[int, int] = dict.fromkeys(self.cutoffs, 0)
+        self.losses: Dict[int, int] = dict.fromkeys(self.cutoffs, 0)
+        self.draws: Dict[int, int] = dict.fromkeys(self.cutoffs, 0)
+        self.hands = 0
+        self.win_reward = win_reward
+        self.loss_reward = loss_reward
+        self.draw_reward = draw_reward
+        self.trajectory: List[Tuple[int, int, bool]] = [] # State of the agent's hand after each card, reused
+
+    def playHand(self) -> None:
+        """
+        Deal one hand and play it out under every cutoff.
+        """
+        shoe = self.shoe
+        dealer = self.dealer
+        shoe.reset()
+        dealer.reset()
+        self.hands += 1
+
+        # Deal in Table's order: two cards to the agent, then two to the dealer
+        first = CARD_VALUES[shoe.drawCard()]
+        second = CARD_VALUES[shoe.drawCard()]
+        value, soft = add_card(*add_card(0, False, first), second)
+        usable_ace = value != first + second # An ace is counted as 1
+        dealer.drawInitial()
+        upcard = UPCARD_KEYS[CARD_VALUES[dealer.hand[0]]]
+        dealer_initial = dealer.calculateHand()
+        initial = (value, upcard, usable_ace)
+
+        # Naturals end the hand before anyone plays, for every cutoff alike
+        if value == 21 or dealer_initial == 21:
+            if dealer_initial == 21:
+                reward, outcomes = (self.draw_reward, self.draws) if value == 21 else (self.loss_reward, self.losses)
+            else:
+                reward, outcomes = self.win_reward, self.wins
+            for cutoff in self.cutoffs:
+                self.policies[cutoff].update(initial, reward)
+                outcomes[cutoff] += 1
+            return
+
+        # Hit until the largest cutoff stands or the hand busts, recording the state after each card
+        trajectory = self.trajectory
+        trajectory.clear()
+        trajectory.append(initial)
+        largest = self.cutoffs[-1]
+        while value < largest and value <= 21:
+            card = CARD_VALUES[shoe.drawCard()]
+            hand, soft = add_card(value, soft, card)
+            usable_ace = usable_ace or hand != value + card
+            value = hand
+            trajectory.append((value, upcard, usable_ace))
+
+        # Each cutoff stands at the first hand that reaches it (or busts). The smallest cutoff
+        # stops first, and the dealer only plays, as in Table, if that hand hasn't busted.
+        position = 0
+        while trajectory[position][0] < self.cutoffs[0]:
+            position += 1
+        dealer_final = dealer_initial
+        if trajectory[position][0] <= 21:
+            dealer.playTurn()
+            dealer_final = dealer.calculateHand()
+
+        # Walk the cutoffs in increasing order along the trajectory, crediting states as they pass
+        for cutoff in self.cutoffs:
+            while trajectory[position][0] < cutoff:
+                position += 1
+            final, _, final_ace = trajectory[position]
+            policy = self.policies[cutoff]
+            visited = dict.fromkeys(trajectory[:position + 1]) # Once per hand, as Agent.visited
+            if final > 21:
+                # Table rewards the busted hand's states at the bust and again at the end of the hand
+                reward, outcomes = self.loss_reward, self.losses
+                for state in visited:
+                    policy.update(state, reward)
+                    policy.update(state, reward)
+            else:
+                if dealer_final > 21 or final > dealer_final:
+                    reward, outcomes = self.win_reward, self.wins
+                elif final == dealer_final:
+                    reward, outcomes = self.draw_reward, self.draws
+                else:
+                    reward, outcomes = self.loss_reward, self.losses
+                for state in visited:
+                    policy.update(state, reward)
+            # The last state, recorded again with the dealer's final total
+            policy.update((final, dealer_final, final_ace), reward)
+            outcomes[cutoff] += 1
+
+    def run(self, episodes: int, progress: bool = False) -> None:
+        """
+        Play the given number of hands under every cutoff.
+        """
+        hands = range(episodes)
+        if progress:
+            hands = tqdm(hands, desc="Sweeping Cutoffs...", bar_format="{desc} ({n_fmt} of {total_fmt})")
+        for _ in hands:
+            self.playHand()
+
+    def winRates(self) -> Dict[int, float]:
+        """
+        Fraction of hands won under each cutoff.
+        """
+        return {cutoff: self.wins[cutoff] / max(self.hands, 1) for cutoff in self.cutoffs}
+
+    def meanRewards(self) -> Dict[int, float]:
+        """
+        Average reward per hand under each cutoff.
+        """
+        hands = max(self.hands, 1)
+        return {cutoff: (self.wins[cutoff] * self.win_reward + self.losses[cutoff] * self.loss_reward
+                         + self.draws[cutoff] * self.draw_reward) / hands
+                for cutoff in self.cutoffs}
+
+
+if __name__ == "__main__":
+    shoe = Shoe()
+    sweep = CutoffSweep(shoe, Dealer(shoe))
+    sweep.run(100000, progress=True)
+
+    win_rates = sweep.winRates()
+    mean_rewards = sweep.meanRewards()
+    print("Cutoff  Win rate  Draw rate  Mean reward")
+    for cutoff in sweep.cutoffs:
+        print(f"{cutoff:>6}  {win_rates[cutoff]:>8.4f}  {sweep.draws[cutoff] / sweep.hands:>9.4f}  {mean_rewards[cutoff]:>+11.4f}")
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Set
 from Actions import Action
 from Agent import Agent
 from Dealer import Dealer
@@ -8,6 +8,8 @@ from Visualizer import BlackjackPolicyVisualizer
 from tqdm import tqdm
 
 class Table:
+    __slots__ = ('agents', 'shoe', 'dealer', 'initial_winners', 'episode_winner', 'episode_queue')
+
     def __init__(self, shoe: Shoe, dealer:Dealer):
         """
         Initialize the table with a shoe and a dealer.
@@ -15,6 +17,7 @@ class Table:
         self.agents: List[Agent] = [] 
         self.shoe = shoe
         self.dealer = dealer
+        self.initial_winners: Set[Agent] = set() # Agents dealt a natural this hand, refilled by playEpisode
 
     def reset(self) -> None:
         for agent in self.agents:
@@ -84,7 +87,11 @@ class Table:
         """
         dealer_hand_full = self.dealer.calculateHand()
         dealer_hand_hide = self.dealer.calculateHand(True)
-        initial_winners = [agent for agent in self.agents if agent.calculateHand() == 21]
+        initial_winners = self.initial_winners
+        initial_winners.clear()
+        for agent in self.agents:
+            if agent.calculateHand() == 21:
+                initial_winners.add(agent)
         
         # Update every agent's initial state
         for agent in self.agents:
@@ -100,8 +107,9 @@ class Table:
             return # End the episode, since the dealer has blackjack.
         elif initial_winners:
             # Case: Some agents have blackjack and the dealer does not
-            for agent in initial_winners:
-                agent.rewardUpdate(agent.win_reward)
+            for agent in self.agents: # Seat order, as the set is unordered
+                if agent in initial_winners:
+                    agent.rewardUpdate(agent.win_reward)
             return # End the episode, since we have winners
 
         # If there is no initial blackjack, each agent takes a turn.
@@ -145,12 +153,16 @@ if __name__ == "__main__":
 
     table.add(agent)
 
-
-    episode_count=100000
-    for _ in tqdm(range(episode_count), desc="Running Episodes...", bar_format="{desc} ({n_fmt} of {total_fmt})"):
-        table.dealInitial()
-        table.playEpisode()
-        table.reset()
+    # Compute the exact state values of the cutoff rule instead of simulating episodes
+    solve_exact = False
+    if solve_exact:
+        agent.policy.solveStateValues(agent.win_reward, agent.loss_reward, agent.draw_reward)
+    else:
+        episode_count=100000
+        for _ in tqdm(range(episode_count), desc="Running Episodes...", bar_format="{desc} ({n_fmt} of {total_fmt})"):
+            table.dealInitial()
+            table.playEpisode()
+            table.reset()
 
    # print(agent.policy.state_values)
    # print(len(agent.policy.state_values))
@@ -1,102 +1,126 @@
-from typing import Tuple
+from typing import List, Set, Tuple
 from Actions import Action
-from MonteCarlo import MonteCarlo
-from random import random, choice
+from MonteCarlo import MonteCarlo, ACTION_INDEX, MAX_HAND, MAX_DEALER, STATE_KEYS
+from Cards import CARD_NAMES, EMPTY_HAND, HAND_VALUE, IS_SOFT, NEXT_STATE
+from Rng import BufferedRandom
 
 ## TODO: agent never adds 'stand' to stateActions
 
+# One shared tuple per (agent hand value, dealer card) state, so recording a state allocates nothing.
+STATES: List[List[Tuple[int,int]]] = [[(hand, dealer) for dealer in range(MAX_DEALER + 1)] for hand in range(MAX_HAND + 1)]
+
 class Agent:
-    def __init__(self, policy: MonteCarlo, name: str = "Agent", epsilon: float = 0.2, win_reward: int = 1, loss_reward: int = -1, draw_reward: int = 0):
+    __slots__ = ('name', 'hand', 'hand_state', 'states', 'visited', 'stateActions', 'keys', 'policy', 'epsilon',
+                 'win_reward', 'loss_reward', 'draw_reward', 'rng')
+
+    def __init__(self, policy: MonteCarlo, name: str = "Agent", epsilon: float = 0.2, win_reward: int = 1, loss_reward: int = -1, draw_reward: int = 0, rng: BufferedRandom | None = None):
         self.name = name
         self.hand = []
-        self.states = []
-        self.stateActions = []
+        self.hand_state = EMPTY_HAND # Hand state id (see Cards.py)
+        # Trajectory buffers. They live as long as the agent and are cleared in place by reset.
+        self.states: List[Tuple[int,int]] = []
+        self.visited: Set[Tuple[int,int]] = set() # Same states as self.states, for O(1) first-visit checks
+        self.stateActions: List[Action] = []
+        # Flat key (see MonteCarlo.PAIR_KEY) of each (state, action) pair, as zip(states, stateActions)
+        # would pair them, added as soon as both halves of a pair are known.
+        self.keys: List[int] = []
         self.policy = policy
         self.epsilon = epsilon # Probability of exploration
         self.win_reward = win_reward
         self.loss_reward = loss_reward
         self.draw_reward = draw_reward
+        self.rng = rng if rng is not None else BufferedRandom() # Random source for exploration in playTurn_legacy
 
-    def receiveCard(self, card: str) -> None:
+    def receiveCard(self, card: int) -> None:
         """
-        Add a card to the agent's hand.
+        Add a card (code) to the agent's hand.
         """
         self.hand.append(card)
+        self.hand_state = NEXT_STATE[self.hand_state][card]
+
+    def isSoft(self) -> bool:
+        """
+        Whether the hand counts an ace as 11.
+        """
+        return IS_SOFT[self.hand_state]
 
     def calculateHand(self) -> int:
         """
         Calculate and return the value of the agent's hand.
         """
-        value = 0
-        aces = 0
-
-        for card in self.hand:
-            if card == 'A':
-                aces += 1
-                value += 11
-            else:
-                value += int(card)
-
-        while value > 21 and aces > 0:
-            value -= 10
-            aces -= 1
-
-        return value
+        return HAND_VALUE[self.hand_state]
 
     def playTurn_legacy(self, dealer_hand: int) -> Action:
-        state = (self.calculateHand(), dealer_hand)
+        state = STATES[HAND_VALUE[self.hand_state]][dealer_hand]
         self.stateUpdate(dealer_hand)
-        if random() < self.epsilon:
+        if self.rng.random() < self.epsilon:
             # exclude the best action if possible
             best_action = self.policy.get_best_action(state)
             possible_actions = [action for action in Action if action != best_action]
-            action = choice(possible_actions) if possible_actions else best_action
+            action = self.rng.choice(possible_actions) if possible_actions else best_action
         else:
             action = self.policy.get_best_action(state)
         self.stateActions.append(action) # Keep track of the actions taken, in order
+        self.pairAction(action)
         return action
 
     def playTurn(self, dealer_hand: int) -> Action:
-        state = (self.calculateHand(), dealer_hand)
+        state = STATES[HAND_VALUE[self.hand_state]][dealer_hand]
         self.stateUpdate(dealer_hand)
         action = self.policy.get_policy(state)
         self.stateActions.append(action)
+        self.pairAction(action)
         return action
 
+    def pairAction(self, action: Action) -> None:
+        """
+        Add the key of the pair an action just appended to stateActions completes, if its state is known.
+        """
+        taken = len(self.stateActions)
+        if taken <= len(self.states):
+            hand, dealer = self.states[taken - 1]
+            self.keys.append(STATE_KEYS[hand][dealer] + ACTION_INDEX[action])
+
     def stateUpdate(self, dealer_hand: int) -> None:
         """
         Takes dealer's hand and updates current state.
         :param dealer_hand: Integer value of the dealer's visible card.
         """
-        state = Tuple[int,int]
-        current_hand = self.calculateHand()
-        state = (current_hand, dealer_hand)
-        if state not in self.states:
+        state = STATES[HAND_VALUE[self.hand_state]][dealer_hand]
+        if state not in self.visited:
+            self.visited.add(state)
             self.states.append(state)
+            # An action taken in a repeated state is paired with the next new state
+            recorded = len(self.states)
+            if recorded <= len(self.stateActions):
+                self.keys.append(STATE_KEYS[state[0]][dealer_hand] + ACTION_INDEX[self.stateActions[recorded - 1]])
 
     def rewardUpdate(self, reward: int) -> None:
         """
-        Receive a reward from the table class, and use it to update every state/action pair in this hand.
+        Receive a reward from the table class, and queue it for every state/action pair in this hand.
+        The policy applies the queued rewards in one grouped update before its next update_actions.
         :param reward: The reward from win/loss/draw in this hand.
         """
-        for state, action in zip(self.states, self.stateActions):
-            self.policy.update(state, action, reward)
+        self.policy.buffer_keys(self.keys, reward)
 
     def reset(self) -> None:
         """
         Clear the agent's hand for a new round.
         """
-        self.hand = []
-        self.states = []
-        self.stateActions = []
+        self.hand.clear()
+        self.hand_state = EMPTY_HAND
+        self.states.clear()
+        self.visited.clear()
+        self.stateActions.clear()
+        self.keys.clear()
 
 
 if __name__ == "__main__":
     policy = MonteCarlo()
     agent = Agent(policy)
-    agent.receiveCard("5")
-    agent.receiveCard("8")
-    print("Agent's hand:", agent.hand)
+    agent.receiveCard(CARD_NAMES.index("5"))
+    agent.receiveCard(CARD_NAMES.index("8"))
+    print("Agent's hand:", [CARD_NAMES[card] for card in agent.hand])
     print("Hand value:", agent.calculateHand())
 
     agent_hand = agent.calculateHand()
@@ -0,0 +1,232 @@
+import numpy as np
+from Actions import Action
+from Cards import CARD_VALUE_ARRAY, DEALER_STANDS_ARRAY, EMPTY_HAND, HAND_VALUE_ARRAY, NEXT_STATE_ARRAY
+from MonteCarlo import MonteCarlo, ACTIONS
+from Shoe import Shoe
+from typing import Optional
+
+# Actions are stored as their index in MonteCarlo.ACTIONS in the trajectory arrays.
+HIT = ACTIONS.index(Action.HIT)
+STAND = ACTIONS.index(Action.STAND)
+
+# Random numbers are drawn for every hand this many cards at a time (see BatchTable._draw).
+DRAWS_PER_BLOCK = 8
+
+
+class BatchResult:
+    """
+    Per-hand trajectories from BatchTable.playEpisodes.
+
+    Attributes:
+    ----------
+    totals : np.ndarray
+        (hands, steps) player total at each decision, -1 after the hand has finished.
+    actions : np.ndarray
+        (hands, steps) action index (see ACTIONS) taken at each decision, -1 after the hand has finished.
+    upcards : np.ndarray
+        (hands,) value of the dealer's visible card.
+    player_totals : np.ndarray
+        (hands,) final value of the player's hand.
+    dealer_totals : np.ndarray
+        (hands,) final value of the dealer's hand.
+    rewards : np.ndarray
+        (hands,) reward the player received for the hand.
+    """
+
+    def __init__(self, totals: np.ndarray, actions: np.ndarray, upcards: np.ndarray,
+                 player_totals: np.ndarray, dealer_totals: np.ndarray, rewards: np.ndarray):
+        self.totals = totals
+        self.actions = actions
+        self.upcards = upcards
+        self.player_totals = player_totals
+        self.dealer_totals = dealer_totals
+        self.rewards = rewards
+
+    def __len__(self) -> int:
+        return len(self.rewards)
+
+    def outcomes(self) -> tuple[int, int, int]:
+        """
+        Count the hands won, lost and drawn, using the same comparison as evaluate_agent.
+        :return: Tuple of (wins, losses, draws).
+        """
+        bust = self.player_totals > 21
+        win = ~bust & ((self.dealer_totals > 21) | (self.player_totals > self.dealer_totals))
+        draw = ~bust & ~win & (self.player_totals == self.dealer_totals)
+        wins = int(win.sum())
+        draws = int(draw.sum())
+        return wins, len(self) - wins - draws, draws
+
+
+class BatchTable:
+    """
+    Plays many independent single-seat hands at once on NumPy arrays.
+
+    Every hand is dealt from its own fresh copy of the shoe, the same way Table.reset
+    refills the shoe after every episode, and follows the rules of Table.playEpisode:
+    naturals end the hand before any decision is made, the agent acts on the
+    current on-policy actions (MonteCarlo.actions) until it stands or busts, and the
+    dealer only plays if the agent is still in the hand.
+
+    Each hand draws its cards with its own sequence of random numbers, so for a given seed the
+    n-th card of hand h is the same whatever the policy does: policies evaluated with the same
+    seed are dealt the same hands, as with a recorded deal file (see Deals.py).
+
+    Hands are dealt and scored as Table scores them, so outcomes() gives the win rates a Table
+    would measure for the same actions. The updates of updatePolicy are not those of a Table
+    seat, though: every decision of a hand receives the hand's reward exactly once. An Agent
+    records each state once per hand, pairs its states and actions by position (so an action
+    taken in a repeated state is credited to the next new state, possibly the final state keyed
+    by the dealer's total), and receives a second loss when it busts. Training with BatchTable
+    therefore learns from a different signal than Table training, and its values are not
+    interchangeable with a Table-trained policy's.
+    """
+
+    def __init__(self, shoe: Shoe, policy: MonteCarlo, seed: Optional[int] = None,
+                 win_reward: int = 1, loss_reward: int = -1, draw_reward: int = 0):
+        """
+        :param shoe: Shoe whose composition (num_decks) each hand is dealt from.
+        :param policy: Policy that provides the on-policy actions and receives the updates.
+        :param seed: Seed for the batch's random generator.
+        """
+        self.shoe = shoe
+        self.policy = policy
+        self.rng = np.random.default_rng(seed)
+        # Random numbers of the current batch, one row per hand and one column per card drawn,
+        # and the number of cards each hand has drawn so far.
+        self.uniforms = np.empty((0, 0))
+        self.drawn = np.empty(0, dtype=np.intp)
+        self.win_reward = win_reward
+        self.loss_reward = loss_reward
+        self.draw_reward = draw_reward
+
+    def _draw(self, counts: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Draw one card without replacement for each of the given hands.
+        :param counts: (hands, 10) remaining card counts, updated in place.
+        :param rows: Indices of the hands that draw.
+        :return: Codes of the drawn cards.
+        """
+        positions = self.drawn[rows]
+        if len(rows) and positions.max() >= self.uniforms.shape[1]:
+            # Blocks are always drawn for every hand and in the same order, so a block's numbers
+            # don't depend on which hands needed it.
+            block = self.rng.random((len(self.drawn), DRAWS_PER_BLOCK))
+            self.uniforms = np.concatenate((self.uniforms, block), axis=1)
+        self.drawn[rows] += 1
+        cumulative = np.cumsum(counts[rows], axis=1)
+        target = self.uniforms[rows, positions] * cumulative[:, -1]
+        cards = (cumulative <= target[:, None]).sum(axis=1)
+        counts[rows, cards] -= 1
+        return cards
+
+    def _deal(self, states: np.ndarray, counts: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Draw a card for each of the given hands and move their hand states (see Cards.py) on.
+        :return: Codes of the drawn cards.
+        """
+        cards = self._draw(counts, rows)
+        states[rows] = NEXT_STATE_ARRAY[states[rows], cards]
+        return cards
+
+    def playEpisodes(self, hands: int) -> BatchResult:
+        """
+        Play a batch of independent hands.
+        :param hands: Number of hands to play.
+        :return: The per-hand trajectories and results.
+        """
+        deck = self.shoe.createDeck(self.shoe.num_decks)
+        counts = np.tile(np.array(deck, dtype=np.int16), (hands, 1))
+        every = np.arange(hands)
+        self.uniforms = self.rng.random((hands, DRAWS_PER_BLOCK))
+        self.drawn = np.zeros(hands, dtype=np.intp)
+
+        player_states = np.full(hands, EMPTY_HAND, dtype=np.intp)
+        dealer_states = np.full(hands, EMPTY_HAND, dtype=np.intp)
+
+        # Same order as Table.dealInitial: two to the agent, then two to the dealer.
+        self._deal(player_states, counts, every)
+        self._deal(player_states, counts, every)
+        upcards = CARD_VALUE_ARRAY[self._deal(dealer_states, counts, every)].astype(np.int16)
+        self._deal(dealer_states, counts, every)
+        player = HAND_VALUE_ARRAY[player_states].astype(np.int16)
+        dealer = HAND_VALUE_ARRAY[dealer_states].astype(np.int16)
+
+        rewards = np.zeros(hands, dtype=np.int8)
+        dealer_natural = dealer == 21
+        player_natural = player == 21
+        rewards[dealer_natural & player_natural] = self.draw_reward
+        rewards[dealer_natural & ~player_natural] = self.loss_reward
+        rewards[~dealer_natural & player_natural] = self.win_reward
+
+        # Agent's turn. Each pass is one decision for every hand still playing, on a frozen copy of
+        # the current on-policy actions (states without one hit, as in MonteCarlo.get_policy).
+        policy = self.policy.freeze()
+        step_totals = []
+        step_actions = []
+        playing = every[~(dealer_natural | player_natural)]
+        while len(playing):
+            totals = np.full(hands, -1, dtype=np.int8)
+            actions = np.full(hands, -1, dtype=np.int8)
+            decisions = policy.act_batch(player[playing], upcards[playing])
+            hit = decisions == HIT
+            totals[playing] = player[playing]
+            actions[playing] = decisions
+            step_totals.append(totals)
+            step_actions.append(actions)
+
+            hitting = playing[hit]
+            self._deal(player_states, counts, hitting)
+            player[hitting] = HAND_VALUE_ARRAY[player_states[hitting]]
+            playing = hitting[player[hitting] <= 21]
+
+        # Dealer's turn, only for hands where the agent is still in.
+        decided = ~(dealer_natural | player_natural)
+        drawing = every[decided & (player <= 21) & ~DEALER_STANDS_ARRAY[dealer_states]]
+        while len(drawing):
+            self._deal(dealer_states, counts, drawing)
+            drawing = drawing[~DEALER_STANDS_ARRAY[dealer_states[drawing]]]
+        dealer = HAND_VALUE_ARRAY[dealer_states].astype(np.int16)
+
+        bust = player > 21
+        win = ~bust & ((dealer > 21) | (player > dealer))
+        draw = ~bust & ~win & (player == dealer)
+        rewards[decided] = self.loss_reward
+        rewards[decided & win] = self.win_reward
+        rewards[decided & draw] = self.draw_reward
+
+        if step_totals:
+            totals = np.stack(step_totals, axis=1)
+            actions = np.stack(step_actions, axis=1)
+        else:
+            totals = np.empty((hands, 0), dtype=np.int8)
+            actions = np.empty((hands, 0), dtype=np.int8)
+        return BatchResult(totals, actions, upcards, player, dealer, rewards)
+
+    def updatePolicy(self, result: BatchResult) -> None:
+        """
+        Pass every (state, action) pair in the batch, with its hand's reward, to the policy in one
+        grouped update (MonteCarlo.update_pairs). Each decision is rewarded once, busts
+        included, unlike the updates of a Table seat (see the class docstring).
+        :param result: Trajectories returned by playEpisodes.
+        """
+        hands, steps = np.nonzero(result.actions >= 0)
+        totals = result.totals[hands, steps].astype(np.intp)
+        actions = result.actions[hands, steps]
+        upcards = result.upcards[hands]
+        _, dealers, action_count = self.policy.values.shape
+        keys = (totals * dealers + upcards) * action_count + actions
+        self.policy.update_pairs(keys, result.rewards[hands])
+
+
+if __name__ == "__main__":
+    shoe = Shoe()
+    policy = MonteCarlo()
+    batch = BatchTable(shoe, policy, seed=0)
+
+    for generation in range(10):
+        policy.update_actions(0.05)
+        result = batch.playEpisodes(100000)
+        batch.updatePolicy(result)
+        wins, losses, draws = result.outcomes()
+        print(f"Generation {generation+1}: {wins} wins, {losses} losses, {draws} draws")
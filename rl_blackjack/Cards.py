@@ -0,0 +1,65 @@
+import numpy as np
+from typing import List
+
+# Cards are small integer codes, in the same order as Shoe.createDeck:
+# 0-7 are the twos to nines, 8 is any ten-valued card and 9 is the ace.
+CARD_NAMES: List[str] = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'A']
+NUM_CARDS = len(CARD_NAMES)
+ACE = CARD_NAMES.index('A')
+
+# Value of each card, with aces counted as 11 (the value of a dealer's visible ace).
+CARD_VALUES: List[int] = [2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+
+# Number of each card in a single deck. Ten covers ten, jack, queen and king.
+CARDS_PER_DECK: List[int] = [4, 4, 4, 4, 4, 4, 4, 4, 16, 4]
+
+# A hand is a single state id: its hard total (every ace counted as 1) times two, plus one if it
+# holds an ace. The largest hard total a hand can reach is 31 (hitting on a hard 21 and drawing a ten).
+MAX_HARD = 31
+NUM_STATES = (MAX_HARD + 1) * 2
+EMPTY_HAND = 0
+
+def hand_state(hard_total: int, has_ace: bool) -> int:
+    """
+    State id of a hand with the given hard total and ace flag.
+    """
+    return hard_total * 2 + int(has_ace)
+
+def _hand_value(state: int) -> int:
+    hard_total, has_ace = divmod(state, 2)
+    # Only one ace can count as 11 without busting, so count it as 11 if it fits.
+    if has_ace and hard_total <= 11:
+        return hard_total + 10
+    return hard_total
+
+def _next_state(state: int, card: int) -> int:
+    hard_total, has_ace = divmod(state, 2)
+    if _hand_value(state) > 21:
+        return state # Busted hands take no more cards
+    hard_total += 1 if card == ACE else CARD_VALUES[card]
+    return hand_state(hard_total, has_ace or card == ACE)
+
+# Value of each hand state, counting an ace as 11 where that doesn't bust.
+HAND_VALUE: List[int] = [_hand_value(state) for state in range(NUM_STATES)]
+
+# Whether each hand state counts an ace as 11.
+IS_SOFT: List[bool] = [state % 2 == 1 and HAND_VALUE[state] != state // 2 for state in range(NUM_STATES)]
+
+# NEXT_STATE[state][card] is the hand state after the card is added.
+NEXT_STATE: List[List[int]] = [[_next_state(state, card) for card in range(NUM_CARDS)] for state in range(NUM_STATES)]
+
+# Whether the dealer stands on each hand state (17 or more, including soft 17).
+DEALER_STANDS: List[bool] = [value >= 17 for value in HAND_VALUE]
+
+# Array versions of the tables for vectorized code, indexed the same way.
+CARD_VALUE_ARRAY = np.array(CARD_VALUES, dtype=np.int8)
+HAND_VALUE_ARRAY = np.array(HAND_VALUE, dtype=np.int8)
+NEXT_STATE_ARRAY = np.array(NEXT_STATE, dtype=np.int8)
+DEALER_STANDS_ARRAY = np.array(DEALER_STANDS, dtype=bool)
+
+
+if __name__ == "__main__":
+    state = EMPTY_HAND
+    for name in ['A', '5', 'A', '10']:
+        state = NEXT_STATE[state][CARD_NAMES.index(name)]
+        print(f"+{name:>2}: state {state:>2}, value {HAND_VALUE[state]:>2}, soft {IS_SOFT[state]}, dealer stands {DEALER_STANDS[state]}")
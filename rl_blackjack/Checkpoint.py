@@ -0,0 +1,45 @@
+import os
+import pickle
+from MonteCarlo import MonteCarlo
+from typing import Any, Dict
+
+# Policy arrays saved in a checkpoint
+POLICY_ARRAYS = ['values', 'counts', 'visited', 'action_table']
+
+def save_checkpoint(filename: str, policy: MonteCarlo, generation: int, **state: Any) -> None:
+    """
+    Atomically write a training checkpoint to a .checkpoint file. The checkpoint is written to a
+    temporary file first and then renamed over the old one, so a crash mid-write never leaves a
+    truncated checkpoint behind.
+    :param filename: Base filename (without extension) to save to.
+    :param policy: Policy whose values, counts and actions are saved.
+    :param generation: Number of generations completed.
+    :param state: Anything else needed to continue the run (RNG state, shoe state, seed...).
+    """
+    policy.flush_updates()
+    full_filename = f"{filename}.checkpoint"
+    temp_filename = f"{full_filename}.tmp"
+    checkpoint = {name: getattr(policy, name) for name in POLICY_ARRAYS}
+    checkpoint['generation'] = generation
+    checkpoint.update(state)
+    with open(temp_filename, 'wb') as f:
+        pickle.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_filename, full_filename)
+
+def load_checkpoint(filename: str, policy: MonteCarlo) -> Dict[str, Any]:
+    """
+    Restore the policy from a .checkpoint file.
+    :param filename: Base filename (without extension) to load from.
+    :param policy: Policy to restore the values, counts and actions into.
+    :return: The rest of the checkpoint ('generation' and the extra state given to save_checkpoint).
+    """
+    full_filename = f"{filename}.checkpoint"
+    with open(full_filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+    for name in POLICY_ARRAYS:
+        getattr(policy, name)[...] = checkpoint.pop(name)
+    policy.invalidate()
+    print(f"Checkpoint loaded from {full_filename} (generation {checkpoint['generation']})")
+    return checkpoint
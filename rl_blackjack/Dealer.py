@@ -1,4 +1,6 @@
 from Agent import Agent
+from Metrics import metrics, clock
+from Cards import CARD_NAMES, CARD_VALUES, DEALER_STANDS, EMPTY_HAND, HAND_VALUE, IS_SOFT, NEXT_STATE
 from Shoe import Shoe
 
 ### TODO: Logic Issue
@@ -6,6 +8,8 @@ from Shoe import Shoe
 ###       Should propably find a way to let agent account for 1 AND 11...
 
 class Dealer:
+    __slots__ = ('hand', 'shoe', 'usable_ace', 'hand_state', 'upcard')
+
     def __init__(self, shoe: Shoe):
         """
         Initialize the dealer with an empty hand and a shoe of cards to draw from.
@@ -15,22 +19,35 @@ class Dealer:
         self.hand = []  # Dealer's hand starts empty
         self.shoe = shoe  # The shoe is used to draw cards
         self.usable_ace: bool = False
+        self.hand_state = EMPTY_HAND  # Hand state id (see Cards.py)
+        self.upcard = 0  # Value of the visible (first) card, ace counted as 11
 
-    def drawInitial(self) -> list[str]:
+    def drawInitial(self) -> list[int]:
         """
         Draw two initial cards for the dealer.
 
         :return: A list containing the dealer's two initial cards.
         """
-        self.hand = [self.shoe.drawCard(), self.shoe.drawCard()]  # Dealer starts with two cards
+        self.hand.clear()
+        self.hand_state = EMPTY_HAND
+        self.addCard(self.shoe.drawCard())  # Dealer starts with two cards
+        self.addCard(self.shoe.drawCard())
+        self.upcard = CARD_VALUES[self.hand[0]]
         return self.hand
 
+    def addCard(self, card: int) -> None:
+        """
+        Add a card (code) to the dealer's hand and update the hand state.
+        """
+        self.hand.append(card)
+        self.hand_state = NEXT_STATE[self.hand_state][card]
+
     def draw(self) -> None:
         """
         Draw a card from the shoe and add it to the dealer's hand.
         """
         card = self.shoe.drawCard()  # Draw a card from the shoe
-        self.hand.append(card)  # Add the drawn card to the hand
+        self.addCard(card)  # Add the drawn card to the hand
 
     def calculateHand(self, hideHand: bool = False) -> int:
         """
@@ -44,29 +61,18 @@ class Dealer:
 
         :return: The total value of the dealer's hand.
         """
-        value = 0  # Total value of the hand
-        aces = 0  # Count of Aces in the hand
-
         if hideHand:
-            hand = [self.hand[0]]
-        else:
-            hand = self.hand
+            return self.upcard
 
-        # Calculate the initial hand value and track Aces
-        for card in hand:
-            if card == 'A':  # Ace can be 1 or 11
-                aces += 1
-                value += 11  # Initially treat Ace as 11
-            else:
-                value += int(card)  # Convert numbered cards ('2' to '10') directly to integers
+        return HAND_VALUE[self.hand_state]
 
-        # Adjust for Aces to avoid busting (Ace can be 1 instead of 11)
-        while value > 21 and aces > 0:
-            value -= 10  # Convert one Ace from 11 to 1
-            aces -= 1  # Reduce the count of Aces being treated as 11
-        return value
+    def isSoft(self) -> bool:
+        """
+        Whether the dealer's hand counts an ace as 11.
+        """
+        return IS_SOFT[self.hand_state]
 
-    def checkHand(self, hideHand: bool = False) -> list[str]:
+    def checkHand(self, hideHand: bool = False) -> list[int]:
         """
         Return the dealer's hand or only the first card based on the game stage.
 
@@ -83,7 +89,9 @@ class Dealer:
         """
         Reset the dealer's hand, clearing all cards for the next round.
         """
-        self.hand = []  # Empty the dealer's hand to prepare for a new round
+        self.hand.clear()  # Empty the dealer's hand to prepare for a new round
+        self.hand_state = EMPTY_HAND
+        self.upcard = 0
 
     def deal(self, agent: Agent) -> None:
         """
@@ -97,10 +105,18 @@ class Dealer:
         Dealer plays their turn according to standard Blackjack rules.
         Draws a card while their hand value is less than 17.
         """
-        while self.calculateHand() < 17:
+        timed = metrics.enabled
+        if timed:
+            start = clock()
+            draws = len(self.hand)
+        while not DEALER_STANDS[self.hand_state]:
             self.draw()
             if debug:
-                print(f"Current Hand: {self.checkHand()}\nValue: {self.calculateHand()}")
+                print(f"Current Hand: {[CARD_NAMES[card] for card in self.checkHand()]}\nValue: {self.calculateHand()}")
+        if timed:
+            metrics.count("dealer_turns")
+            metrics.count("dealer_draws", len(self.hand) - draws)
+            metrics.add_time("dealer_turn", clock() - start)
  
 if __name__ == "__main__":
     # Initialize a shoe and a dealer
@@ -109,7 +125,7 @@ if __name__ == "__main__":
 
     # Draw initial cards and display them
     initial_hand = dealer.drawInitial()
-    print("Dealer's initial hand:", initial_hand)
+    print("Dealer's initial hand:", [CARD_NAMES[card] for card in initial_hand])
     
     # Calculate hand value after the initial draw
     initial_value = dealer.calculateHand()
@@ -117,17 +133,17 @@ if __name__ == "__main__":
     
     # Draw another card and display the hand and new value
     dealer.draw()
-    print("Dealer's hand after drawing one more card:", dealer.hand)
+    print("Dealer's hand after drawing one more card:", [CARD_NAMES[card] for card in dealer.hand])
 
     new_value = dealer.calculateHand()
     print("Hand value after additional draw:", new_value)
     
     # Check hand (showing only first card, as in the initial display for the player)
-    print("Dealer's visible card for player view:", dealer.checkHand(hideHand=True))
+    print("Dealer's visible card for player view:", [CARD_NAMES[card] for card in dealer.checkHand(hideHand=True)])
     print(f"Dealer's visible hand values: {dealer.calculateHand(True)}")
     
     # Check hand (showing full hand, typically for endgame view)
-    print("Dealer's full hand for endgame view:", dealer.checkHand(hideHand=False))
+    print("Dealer's full hand for endgame view:", [CARD_NAMES[card] for card in dealer.checkHand(hideHand=False)])
 
     # Reset the dealer's hand for a new round
     dealer.reset()
@@ -135,7 +151,7 @@ if __name__ == "__main__":
 
     print("\nPlaying a round:")
     dealer.drawInitial()
-    print("Initial Hand:", dealer.checkHand())
+    print("Initial Hand:", [CARD_NAMES[card] for card in dealer.checkHand()])
     dealer.playTurn(True)
     if dealer.calculateHand() > 21:
         print("BUST")
@@ -0,0 +1,76 @@
+from functools import lru_cache
+from Cards import CARD_NAMES, DEALER_STANDS, EMPTY_HAND, HAND_VALUE, NEXT_STATE
+from Shoe import Shoe
+from typing import Dict, List, Tuple
+
+# Final dealer totals. Anything over 21 is a bust.
+OUTCOMES = [17, 18, 19, 20, 21, 'bust']
+BUST = len(OUTCOMES) - 1
+
+class DealerOdds:
+    """
+    Exact distribution of the dealer's final hand, following Dealer.playTurn (draw below 17,
+    stand on all 17s) with cards drawn without replacement from a given shoe composition.
+
+    Results are memoized in an LRU cache keyed by the dealer's hand and the remaining
+    composition, so repeated lookups for the same upcard and shoe cost a single cache hit.
+    """
+
+    def __init__(self, cache_size: int = 65536):
+        """
+        :param cache_size: Maximum number of (hand, composition) entries to keep. None for no limit.
+        """
+        self.cache_size = cache_size
+        self._final = lru_cache(maxsize=cache_size)(self._final_uncached)
+
+    def distribution(self, upcard: int, deck: List[int]) -> Dict[int | str, float]:
+        """
+        Probability of each final dealer total, given the upcard and the cards left in the shoe.
+        The hole card and every later draw come from deck. Naturals count as 21.
+        :param upcard: Code of the dealer's visible card (see Cards.py).
+        :param deck: Remaining card counts, as in Shoe.deck.
+        :return: Dict mapping 17-21 and 'bust' to their probabilities.
+        """
+        probabilities = self._final(NEXT_STATE[EMPTY_HAND][upcard], tuple(deck))
+        return dict(zip(OUTCOMES, probabilities))
+
+    def cache_info(self):
+        """
+        Hit/miss statistics of the composition cache.
+        """
+        return self._final.cache_info()
+
+    def clear_cache(self) -> None:
+        self._final.cache_clear()
+
+    def _final_uncached(self, hand_state: int, counts: Tuple[int, ...]) -> Tuple[float, ...]:
+        """
+        Distribution over OUTCOMES for a dealer hand state (see Cards.py) and the remaining card counts.
+        """
+        result = [0.0] * len(OUTCOMES)
+        if DEALER_STANDS[hand_state]:
+            value = HAND_VALUE[hand_state]
+            result[BUST if value > 21 else OUTCOMES.index(value)] = 1.0
+            return tuple(result)
+
+        remaining = sum(counts)
+        for index, count in enumerate(counts):
+            if count == 0:
+                continue
+            drawn = counts[:index] + (count - 1,) + counts[index + 1:]
+            after = self._final(NEXT_STATE[hand_state][index], drawn)
+            weight = count / remaining
+            for outcome, probability in enumerate(after):
+                result[outcome] += weight * probability
+        return tuple(result)
+
+
+if __name__ == "__main__":
+    odds = DealerOdds()
+    shoe = Shoe(num_decks=6)
+    for upcard, name in enumerate(CARD_NAMES):
+        deck = list(shoe.deck)
+        deck[upcard] -= 1
+        distribution = odds.distribution(upcard, deck)
+        print(f"{name:>2}: " + "  ".join(f"{outcome}: {p:.3f}" for outcome, p in distribution.items()))
+    print(odds.cache_info())
@@ -0,0 +1,180 @@
+import mmap
+import os
+import struct
+from Metrics import metrics
+from Rng import BufferedRandom
+from Shoe import Shoe
+from typing import List, Tuple
+
+# Deal files are a fixed little-endian header followed by one block of CARDS_PER_HAND bytes per hand,
+# one byte (card code, see Cards.py) per card. Every hand starts at a fixed offset, so any policy can
+# replay hand n however many cards it took in the hands before, and chunks of hands can be written
+# or read independently by separate processes.
+DEALS_MAGIC = b"MCDEALS\0"
+DEALS_VERSION = 1
+DEALS_HEADER = struct.Struct("<8sHHH18x") # magic, version, number of decks, cards per hand
+
+# Cards reserved for each hand. A single seat hardly ever needs more than a dozen.
+CARDS_PER_HAND = 24
+
+def create_deals(filename: str, hands: int, num_decks: int = 1, cards_per_hand: int = CARDS_PER_HAND) -> None:
+    """
+    Create a deal file with room for the given number of hands, for RecordingShoes to fill in.
+    :param filename: Name of the file to create (with extension).
+    """
+    with open(filename, 'wb') as f:
+        f.write(DEALS_HEADER.pack(DEALS_MAGIC, DEALS_VERSION, num_decks, cards_per_hand))
+        f.truncate(DEALS_HEADER.size + hands * cards_per_hand)
+
+def read_deals_header(filename: str) -> Tuple[int, int, int]:
+    """
+    :return: Tuple of (number of decks, cards per hand, number of hands) of a deal file.
+    """
+    with open(filename, 'rb') as f:
+        magic, version, num_decks, cards_per_hand = DEALS_HEADER.unpack(f.read(DEALS_HEADER.size))
+    if magic != DEALS_MAGIC:
+        raise ValueError(f"{filename} is not a deal file.")
+    if version != DEALS_VERSION:
+        raise ValueError(f"{filename} has unsupported version {version}.")
+    hands = (os.path.getsize(filename) - DEALS_HEADER.size) // cards_per_hand
+    return num_decks, cards_per_hand, hands
+
+
+class RecordingShoe(Shoe):
+    """
+    Shoe that records its deals to a deal file (see create_deals) while dealing normally.
+
+    At the start of each hand the shoe reserves a block of cards_per_hand cards, drawn as Shoe
+    would, and deals the hand from that block. reset() writes the whole block, including the
+    cards the hand didn't use, so replaying hand n never depends on how many cards other hands
+    took. Only shoes refilled after every hand can be recorded: with penetration the reserved
+    blocks would use up each shuffle faster than the hands played from it.
+    """
+    __slots__ = ('file', 'block', 'dealt')
+
+    def __init__(self, filename: str, first_hand: int = 0, num_decks: int = 1, penetration: float | None = None,
+                 rng: BufferedRandom | None = None):
+        """
+        :param filename: Deal file to record into, made with create_deals for the same number of decks.
+        :param first_hand: Index of the first hand to record, e.g. the start of a worker's chunk.
+        """
+        if penetration is not None:
+            raise ValueError("Deals can only be recorded from a shoe refilled after every hand, not with penetration.")
+        file_decks, cards_per_hand, _ = read_deals_header(filename)
+        if file_decks != num_decks:
+            raise ValueError(f"{filename} was created for {file_decks} decks, not {num_decks}.")
+        super().__init__(num_decks, penetration, rng)
+        self.file = open(filename, 'r+b')
+        self.file.seek(DEALS_HEADER.size + first_hand * cards_per_hand)
+        self.block: List[int] = [0] * cards_per_hand
+        self.dealt = 0
+        self._reserve()
+
+    def _reserve(self) -> None:
+        """
+        Draw the next hand's block of cards. Only the cards the hand deals count as drawn, in
+        the metrics and in the deck counts.
+        """
+        block = self.block
+        draw = super().drawCard
+        for index in range(len(block)):
+            block[index] = draw()
+        self.deck[:] = self.full_deck
+        self.dealt = 0
+        if metrics.enabled:
+            metrics.count("cards_drawn", -len(block))
+
+    def drawCard(self) -> int:
+        if metrics.enabled:
+            metrics.count("cards_drawn")
+        if self.dealt == len(self.block):
+            raise ValueError(f"A hand needed more than {len(self.block)} cards; record with more cards per hand.")
+        card = self.block[self.dealt]
+        self.dealt += 1
+        self.deck[card] -= 1
+        return card
+
+    def reset(self) -> None:
+        """
+        Write the finished hand's block and reserve the next one.
+        """
+        self.file.write(bytes(self.block))
+        super().reset()
+        self._reserve()
+
+    def close(self) -> None:
+        """
+        Close the deal file. The block reserved for the unplayed next hand is not written.
+        """
+        self.file.close()
+
+
+class ReplayShoe(Shoe):
+    """
+    Shoe that deals the hands of a deal file in order, so different policies can be evaluated on
+    exactly the same hands. The file is memory-mapped, so processes replaying it share one copy.
+    """
+    __slots__ = ('map', 'cards_per_hand', 'hands', 'hand', 'block', 'dealt')
+
+    def __init__(self, filename: str, first_hand: int = 0):
+        """
+        :param filename: Deal file to replay.
+        :param first_hand: Index of the first hand to deal, e.g. the start of a worker's chunk.
+        """
+        num_decks, self.cards_per_hand, self.hands = read_deals_header(filename)
+        super().__init__(num_decks)
+        with open(filename, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.hand = first_hand
+        self._load()
+
+    def _load(self) -> None:
+        """
+        Fetch the current hand's block from the file.
+        """
+        start = DEALS_HEADER.size + self.hand * self.cards_per_hand
+        self.block = self.map[start:start + self.cards_per_hand] if self.hand < self.hands else b""
+        self.dealt = 0
+
+    def drawCard(self) -> int:
+        if metrics.enabled:
+            metrics.count("cards_drawn")
+        if self.dealt == len(self.block):
+            if self.hand >= self.hands:
+                raise ValueError(f"All {self.hands} recorded hands have been dealt.")
+            raise ValueError(f"Hand {self.hand} needed more than the {self.cards_per_hand} cards recorded for it.")
+        card = self.block[self.dealt] # Indexing bytes gives the card code as an int
+        self.dealt += 1
+        self.deck[card] -= 1
+        return card
+
+    def reset(self) -> None:
+        """
+        Refill the shoe and move on to the next recorded hand.
+        """
+        self.deck[:] = self.full_deck
+        self.hand += 1
+        self._load()
+
+    def close(self) -> None:
+        self.map.close()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from Cards import CARD_NAMES
+
+    filename = os.path.join(tempfile.mkdtemp(), "deals.bin")
+    create_deals(filename, hands=3)
+    shoe = RecordingShoe(filename, rng=BufferedRandom(1))
+    recorded = []
+    for _ in range(3):
+        recorded.append([CARD_NAMES[shoe.drawCard()] for _ in range(4)])
+        shoe.reset()
+    shoe.close()
+
+    replay = ReplayShoe(filename)
+    for hand in recorded:
+        print(hand, [CARD_NAMES[replay.drawCard()] for _ in range(4)])
+        replay.reset()
+    print(read_deals_header(filename))
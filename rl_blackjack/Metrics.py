@@ -0,0 +1,70 @@
+from time import perf_counter as clock
+from typing import Dict
+
+class MetricsRegistry:
+    """
+    Opt-in counters and phase timers for the simulation's hot paths.
+
+    Instrumented code checks `metrics.enabled` before recording anything, so while the
+    registry is disabled (the default) each instrumentation point costs a single attribute
+    check and the counters can stay in production runs.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, float] = {}
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Add to a counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, name: str, seconds: float) -> None:
+        """
+        Add elapsed time to a phase timer.
+        """
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def snapshot(self, reset: bool = False) -> Dict[str, Dict[str, float]]:
+        """
+        Copy of the current counters and timers.
+        :param reset: Clear the registry afterwards, e.g. to take one snapshot per generation.
+        :return: Dict with 'counters' and 'timers' (seconds).
+        """
+        snapshot = {'counters': dict(self.counters), 'timers': dict(self.timers)}
+        if reset:
+            self.reset()
+        return snapshot
+
+    def merge(self, snapshot: Dict[str, Dict[str, float]]) -> None:
+        """
+        Add a snapshot taken elsewhere (e.g. in a worker process) to this registry.
+        """
+        for name, amount in snapshot['counters'].items():
+            self.count(name, amount)
+        for name, seconds in snapshot['timers'].items():
+            self.add_time(name, seconds)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.timers.clear()
+
+    @staticmethod
+    def format(snapshot: Dict[str, Dict[str, float]]) -> str:
+        """
+        Render a snapshot as a short report, with per-hand averages where hands were counted.
+        """
+        counters = snapshot['counters']
+        hands = counters.get('hands', 0)
+        lines = []
+        for name, amount in sorted(counters.items()):
+            per_hand = f" ({amount / hands:.3f} per hand)" if hands and name != 'hands' else ""
+            lines.append(f"  {name}: {amount}{per_hand}")
+        for name, seconds in sorted(snapshot['timers'].items()):
+            lines.append(f"  {name} time: {seconds:.3f}s")
+        return "\n".join(lines)
+
+# The registry shared by every instrumented module in this process
+metrics = MetricsRegistry()
@@ -1,30 +1,123 @@
 import os
 import pickle
-from random import random, choice
+import struct
+import numpy as np
 from Actions import Action
-from typing import Dict, Tuple
+from Metrics import clock, metrics
+from Rng import BufferedRandom
+from typing import Dict, List, Sequence, Tuple
+
+# States are (agent hand value, dealer card). The largest hand is 31 (hitting on 21 and drawing a 10).
+# The dealer's visible card is at most 11 (an ace), but Table.playEpisode also records a state with the
+# dealer's final hand, which can reach 26 (hitting on 16 and drawing a 10).
+MAX_HAND = 31
+MAX_DEALER = 26
+
+# Actions are stored by their position in the Action enum.
+ACTIONS: List[Action] = list(Action)
+ACTION_INDEX: Dict[Action,int] = {action: index for index, action in enumerate(ACTIONS)}
+NO_ACTION = -1
+
+# Flat index into the value arrays of every (state, action) pair, for queuing updates without arithmetic.
+PAIR_KEY: Dict[Tuple[Tuple[int,int],Action],int] = {
+    ((hand, dealer), action): (hand * (MAX_DEALER + 1) + dealer) * len(ACTIONS) + index
+    for hand in range(MAX_HAND + 1) for dealer in range(MAX_DEALER + 1) for index, action in enumerate(ACTIONS)}
+# Flat index of each state's first action, indexed [agent hand][dealer card]. Adding an action's
+# index gives the pair's PAIR_KEY without building or hashing a tuple.
+STATE_KEYS: List[List[int]] = [[(hand * (MAX_DEALER + 1) + dealer) * len(ACTIONS) for dealer in range(MAX_DEALER + 1)]
+                               for hand in range(MAX_HAND + 1)]
+
+# Binary policy files (.mcpolicy) are a fixed little-endian header followed by the flat arrays:
+# values (float64), counts (int64), visited (uint8) and action_table (int8), in C order.
+BINARY_MAGIC = b"MCPOLICY"
+BINARY_VERSION = 1
+BINARY_HEADER = struct.Struct("<8sHHHH16x") # magic, version, hand size, dealer size, action count
+
+# Queued updates are flushed automatically once this many are pending, so a long run between
+# update_actions calls can't grow the queue without bound.
+MAX_PENDING = 1 << 20
 
 class MonteCarlo:
-    def __init__(self):
-        # Dictionary to hold the "best" action for each state
-        # States defined as a tuple - (agent hand value, dealer card)
-        # Values are actions, initially set to "HIT" for simplicity
+    def __init__(self, rng: BufferedRandom | None = None):
+        """
+        :param rng: Random source for exploration in update_actions. Defaults to a new, unseeded one.
+        """
+        self.rng = rng if rng is not None else BufferedRandom()
+        # Action values, visit counts and on-policy actions live in fixed-shape arrays indexed by
+        # [agent hand value, dealer card(, action)]. The dict views (policy, actions, state_count)
+        # are built from these arrays on demand.
+        shape = (MAX_HAND + 1, MAX_DEALER + 1)
+        self.values = np.zeros(shape + (len(ACTIONS),), dtype=np.float64)
+        self.counts = np.zeros(shape + (len(ACTIONS),), dtype=np.int64)
+        self.visited = np.zeros(shape, dtype=bool) # States that have been initialized
+        self.action_table = np.full(shape, NO_ACTION, dtype=np.int8) # On-policy action index per state
+        # Greedy action per state as of the last update_actions, and the states whose values have
+        # changed since then. Only those are recomputed at the next rebuild.
+        self.greedy = np.zeros(shape, dtype=np.int8)
+        self.dirty = np.zeros(shape, dtype=bool)
+        # Rewards queued by buffer_keys, as flat [agent hand, dealer card, action] indices into
+        # values, and each queued episode's reward and number of keys. flush_updates applies them
+        # in one grouped update.
+        self.pending_keys: List[int] = []
+        self.pending_rewards: List[int] = []
+        self.pending_lengths: List[int] = []
+
+    @property
+    def policy(self) -> Dict[Tuple[int,int],Dict[Action,float]]:
+        """
+        State/action values for every initialized state, as {(agent_hand, dealer_hand): {Action: value}}.
+        Queued updates are applied first.
+        """
+        self.flush_updates()
+        return {(hand, dealer): {action: float(self.values[hand, dealer, index]) for action, index in ACTION_INDEX.items()}
+                for hand, dealer in np.argwhere(self.visited).tolist()}
+
+    @policy.setter
+    def policy(self, policy: Dict[Tuple[int,int],Dict[Action,float]]) -> None:
+        self.values[:] = 0
+        self.visited[:] = False
+        for (hand, dealer), action_values in policy.items():
+            self.visited[hand, dealer] = True
+            for action, value in action_values.items():
+                self.values[hand, dealer, ACTION_INDEX[action]] = value
+        self.invalidate()
+
+    @property
+    def actions(self) -> Dict[Tuple[int,int],Action]:
+        """
+        The on-policy action for every state that has one, as {(agent_hand, dealer_hand): Action}.
+        """
+        return {(hand, dealer): ACTIONS[self.action_table[hand, dealer]]
+                for hand, dealer in np.argwhere(self.action_table != NO_ACTION).tolist()}
+
+    @actions.setter
+    def actions(self, actions: Dict[Tuple[int,int],Action]) -> None:
+        self.action_table[:] = NO_ACTION
+        for (hand, dealer), action in actions.items():
+            self.action_table[hand, dealer] = ACTION_INDEX[action]
+
+    @property
+    def state_count(self) -> Dict[Tuple[Tuple[int,int],Action],int]:
+        """
+        Number of times each state/action pair has been updated, as {((agent_hand, dealer_hand), Action): count}.
+        Queued updates are applied first.
+        """
+        self.flush_updates()
+        return {((hand, dealer), action): int(self.counts[hand, dealer, index])
+                for hand, dealer in np.argwhere(self.visited).tolist() for action, index in ACTION_INDEX.items()}
 
-        self.policy: Dict[Tuple[int,int],Dict[Action,float]] = {}
-        self.actions: Dict[Tuple[int,int],Action] = {}
-        self.state_count: Dict[Tuple[Tuple[int,int],Action],int] = {} # Counts the number of times a state has been visited. For discounting?
+    def invalidate(self) -> None:
+        """
+        Mark every state as changed, after the value arrays have been replaced wholesale (loading a file or checkpoint).
+        """
+        self.dirty = np.ones(self.values.shape[:2], dtype=bool)
 
     def initialize_state(self, state: Tuple[int,int]) -> None:
         """
         Initialize a state with a default action.
         :param state: Tuple with agents hand value and dealers hand value.
         """
-        if state not in self.policy:
-            self.policy[state] = {Action.HIT: 0, Action.STAND: 0}
-        if (state, Action.HIT) not in self.state_count:
-            self.state_count[state,Action.HIT] = 0
-        if (state, Action.STAND) not in self.state_count:
-            self.state_count[state,Action.STAND] = 0
+        self.visited[state] = True
 
     def update(self, state: Tuple[int,int], action: Action, reward: int) -> None:
         """
@@ -33,14 +126,16 @@ class MonteCarlo:
         :param action: The action to update for this state.
         :param value: The value to assign the action
         """
-        self.initialize_state(state)
-        self.state_count[state,action] += 1
-        # print(state)
-        # print(action)
-        action_value = self.policy[state][action]
-        action_count = self.state_count[state,action]
-        self.policy[state][action] = action_value+(reward-action_value)/action_count
-
+        if metrics.enabled:
+            metrics.count("policy_updates")
+        hand, dealer = state
+        index = ACTION_INDEX[action]
+        self.visited[hand, dealer] = True
+        self.dirty[hand, dealer] = True
+        count = self.counts[hand, dealer, index] + 1
+        self.counts[hand, dealer, index] = count
+        action_value = self.values[hand, dealer, index]
+        self.values[hand, dealer, index] = action_value+(reward-action_value)/count
 
     def get_best_action(self, state: Tuple[int,int]) -> Action:
         """
@@ -48,30 +143,38 @@ class MonteCarlo:
         :param state: State. Tuple of agent's hand value and dealer's visible hand.
         :return: The 'best' action for this state.
         """
+        self.flush_updates()
         self.initialize_state(state)
+        # Ties go to the first action, as max() over the old {Action: value} dict did.
+        return ACTIONS[int(self.values[state].argmax())]
 
-        # This is somewhat arcane, but should return the Action with the highest value.
-        # Based on the dict structure I use, where policy is a Dict that looks like:
-        # Policy = {
-        #            (agent_hand,dealer_hand): {
-        #                                        Action: Value
-        #                                      }
-        #          }
-
-        return max(self.policy[state].items(), key=lambda k: k[1])[0]
+    def best_actions(self) -> np.ndarray:
+        """
+        Greedy action index for every state in the table.
+        :return: Array indexed by [agent hand value, dealer card].
+        """
+        self.flush_updates()
+        return self.values.argmax(axis=2).astype(np.int8)
 
     def update_actions(self, epsilon: float) -> None:
         """
         Use the given state/value actions (self.policy) to populate a fixed policy associating states with actions.
+        Every visited state gets its greedy action, or with probability epsilon one of the other actions.
+        Queued updates are applied first, and greedy actions are only recomputed for states updated since the last call.
         """
-        for state in self.policy.keys():
-            if random() < epsilon:
-                best_action = self.get_best_action(state)
-                possible_actions = [action for action in Action if action != best_action]
-                action = choice(possible_actions) if possible_actions else best_action
-            else:
-                action = self.get_best_action(state)
-            self.actions[state] = action
+        self.flush_updates()
+        dirty = self.dirty.nonzero()
+        self.greedy[dirty] = self.values[dirty].argmax(axis=1)
+        self.dirty[dirty] = False
+
+        states = self.visited.nonzero()
+        actions = self.greedy[states]
+        explore = self.rng.uniforms(len(actions)) < epsilon
+        if len(ACTIONS) > 1 and explore.any():
+            # Step from the greedy action to a uniformly chosen different one
+            steps = 1 + (self.rng.uniforms(int(explore.sum())) * (len(ACTIONS) - 1)).astype(np.int8)
+            actions[explore] = (actions[explore] + steps) % len(ACTIONS)
+        self.action_table[states] = actions
 
     def get_policy(self, state: Tuple[int,int]) -> Action:
         """
@@ -79,16 +182,25 @@ class MonteCarlo:
         If there is no known on-policy action, hit.
         :param state: The agent's current state.
         """
-        if state not in self.actions.keys():
+        action = self.action_table[state]
+        if action == NO_ACTION:
             return Action.HIT
         else:
-            return self.actions[state]
+            return ACTIONS[action]
+
+    def freeze(self, default: Action = Action.HIT) -> 'FrozenPolicy':
+        """
+        Compile the current on-policy actions into an immutable lookup table for read-only play.
+        :param default: Action for states without an on-policy action.
+        """
+        return FrozenPolicy(self.action_table, default)
 
     def save(self, filename: str) -> None:
         """
         Save the policy to a .MonteCarlo file.
         :param filename: Base filename (without extension) to save to.
         """
+        self.flush_updates()
         full_filename = f"{filename}.MonteCarlo"
         with open(full_filename, 'wb') as f:
             pickle.dump(self.policy, f)
@@ -109,4 +221,198 @@ class MonteCarlo:
             self.policy = pickle.load(f)
             self.actions = pickle.load(f)
         print(f"Policy loaded from {full_filename}")
-        
+
+    def buffer_update(self, states: List[Tuple[int,int]], actions: List[Action], reward: int) -> None:
+        """
+        Queue the reward of an episode for each of its state/action pairs, as buffer_keys does.
+        :param states: States visited in the episode, as in update.
+        :param actions: Action taken in each state. Pairs are matched up as zip(states, actions).
+        :param reward: The episode's reward.
+        """
+        self.buffer_keys([PAIR_KEY[pair] for pair in zip(states, actions)], reward)
+
+    def buffer_keys(self, keys: List[int], reward: int) -> None:
+        """
+        Queue the reward of an episode for each of its state/action pairs. Nothing changes until
+        flush_updates (or update_actions, which flushes first) applies the queue in one grouped update,
+        or until MAX_PENDING updates are queued, when the queue is flushed here.
+        :param keys: Flat index of each pair (see PAIR_KEY and STATE_KEYS), as Agent keeps them.
+        :param reward: The episode's reward.
+        """
+        pending = self.pending_keys
+        pending.extend(keys)
+        self.pending_rewards.append(reward)
+        self.pending_lengths.append(len(keys))
+        if len(pending) >= MAX_PENDING:
+            self.flush_updates()
+
+    def flush_updates(self) -> None:
+        """
+        Apply every queued update. The result is the same average as calling update for each
+        queued (state, action, reward) in turn.
+        """
+        if not self.pending_keys:
+            self.pending_rewards.clear()
+            self.pending_lengths.clear()
+            return
+        if metrics.enabled:
+            start = clock()
+        rewards = np.repeat(np.array(self.pending_rewards), self.pending_lengths)
+        self.update_pairs(self.pending_keys, rewards)
+        self.pending_keys.clear()
+        self.pending_rewards.clear()
+        self.pending_lengths.clear()
+        if metrics.enabled:
+            metrics.add_time("reward_flush", clock() - start)
+
+    def update_pairs(self, keys: Sequence[int] | np.ndarray, rewards: Sequence[int] | np.ndarray) -> None:
+        """
+        Apply many updates at once, grouped by state/action pair with a count and a sum per pair.
+        :param keys: Flat index into values of each updated state/action pair, repeats allowed.
+        :param rewards: Reward for each of them.
+        """
+        if metrics.enabled:
+            metrics.count("policy_updates", len(keys))
+        counts = np.bincount(keys, minlength=self.values.size)
+        returns = np.bincount(keys, weights=rewards, minlength=self.values.size)
+        present = np.flatnonzero(counts)
+        self.merge_pairs(present, counts[present], returns[present])
+
+    def merge(self, counts: np.ndarray, returns: np.ndarray) -> None:
+        """
+        Fold visit counts and summed rewards gathered elsewhere (e.g. in worker processes) into the
+        running averages. The result is the same average as calling update once per reward.
+        :param counts: Number of rewards per [agent hand, dealer card, action], shaped like self.counts.
+        :param returns: Sum of those rewards, shaped like self.values.
+        """
+        self.flush_updates()
+        keys = np.flatnonzero(counts)
+        self.merge_pairs(keys, counts.reshape(-1)[keys], returns.reshape(-1)[keys])
+
+    def merge_pairs(self, keys: np.ndarray, counts: np.ndarray, returns: np.ndarray) -> None:
+        """
+        Fold visit counts and summed rewards for a set of state/action pairs into the running averages.
+        :param keys: Distinct flat indices into self.values (see np.ravel_multi_index).
+        :param counts: Number of rewards for each pair.
+        :param returns: Sum of those rewards.
+        """
+        values = self.values.reshape(-1)
+        total = self.counts.reshape(-1)[keys] + counts
+        values[keys] += (returns - counts * values[keys]) / total
+        self.counts.reshape(-1)[keys] = total
+        states = keys // len(ACTIONS)
+        self.visited.reshape(-1)[states] = True
+        self.dirty.reshape(-1)[states] = True
+
+    def save_binary(self, filename: str) -> None:
+        """
+        Save values, counts and actions to a .mcpolicy file.
+        :param filename: Base filename (without extension) to save to.
+        """
+        self.flush_updates()
+        full_filename = f"{filename}.mcpolicy"
+        hands, dealers, actions = self.values.shape
+        with open(full_filename, 'wb') as f:
+            f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, hands, dealers, actions))
+            f.write(self.values.astype('<f8').tobytes())
+            f.write(self.counts.astype('<i8').tobytes())
+            f.write(self.visited.astype(np.uint8).tobytes())
+            f.write(self.action_table.astype(np.int8).tobytes())
+        print(f"Policy saved to {full_filename}")
+
+    def load_binary(self, filename: str, mmap: bool = False) -> None:
+        """
+        Load values, counts and actions from a .mcpolicy file.
+        :param filename: Name of the file to load (without extension).
+        :param mmap: Memory-map the arrays read-only instead of copying them. Processes that map
+                     the same file share one copy, but the policy can then no longer be updated.
+        """
+        full_filename = f"{filename}.mcpolicy"
+
+        if not os.path.exists(full_filename):
+            print(f"File {full_filename} not found. Policy not loaded.")
+            return
+        with open(full_filename, 'rb') as f:
+            magic, version, hands, dealers, actions = BINARY_HEADER.unpack(f.read(BINARY_HEADER.size))
+        if magic != BINARY_MAGIC:
+            raise ValueError(f"{full_filename} is not a binary policy file.")
+        if version != BINARY_VERSION:
+            raise ValueError(f"{full_filename} has unsupported version {version}.")
+        if (hands, dealers, actions) != self.values.shape:
+            raise ValueError(f"{full_filename} has shape {(hands, dealers, actions)}, expected {self.values.shape}.")
+
+        arrays = [('values', '<f8', (hands, dealers, actions)),
+                  ('counts', '<i8', (hands, dealers, actions)),
+                  ('visited', np.uint8, (hands, dealers)),
+                  ('action_table', np.int8, (hands, dealers))]
+        offset = BINARY_HEADER.size
+        for name, dtype, shape in arrays:
+            array = np.memmap(full_filename, dtype=dtype, mode='r', offset=offset, shape=shape)
+            offset += array.nbytes
+            if name == 'visited':
+                array = array.view(bool)
+            setattr(self, name, array if mmap else np.array(array, dtype=getattr(self, name).dtype))
+        self.invalidate()
+        print(f"Policy loaded from {full_filename}")
+
+
+class FrozenPolicy:
+    """
+    Immutable on-policy actions of a MonteCarlo policy, from MonteCarlo.freeze.
+
+    Every state, including those the policy has never seen, maps to an action, so a decision is a
+    single lookup and playing never writes to the policy. The table is a read-only array that
+    pickles compactly, so frozen policies can be shared between threads and sent to worker processes.
+    """
+    __slots__ = ('table', 'rows')
+
+    def __init__(self, action_table: np.ndarray, default: Action = Action.HIT):
+        """
+        :param action_table: On-policy action indices (see ACTIONS), NO_ACTION where there is none.
+        :param default: Action for states without an on-policy action.
+        """
+        table = np.where(action_table == NO_ACTION, ACTION_INDEX[default], action_table).astype(np.int8)
+        table.flags.writeable = False
+        self.table = table
+        # The same table as Actions, for scalar lookups without NumPy scalar overhead
+        self.rows: Tuple[Tuple[Action, ...], ...] = tuple(tuple(ACTIONS[index] for index in row) for row in table.tolist())
+
+    def __getstate__(self) -> np.ndarray:
+        return self.table
+
+    def __setstate__(self, table: np.ndarray) -> None:
+        self.__init__(table)
+
+    def act(self, total: int, upcard: int) -> Action:
+        """
+        On-policy action for an agent hand value and dealer card.
+        """
+        return self.rows[total][upcard]
+
+    def act_batch(self, totals: np.ndarray, upcards: np.ndarray) -> np.ndarray:
+        """
+        On-policy action indices (see ACTIONS) for arrays of agent hand values and dealer cards.
+        """
+        return self.table[totals, upcards]
+
+    def get_policy(self, state: Tuple[int,int]) -> Action:
+        """
+        Same as MonteCarlo.get_policy, so a frozen policy can stand in for the policy an Agent plays.
+        """
+        hand, dealer = state
+        return self.rows[hand][dealer]
+
+    def update(self, state: Tuple[int,int], action: Action, reward: int) -> None:
+        """
+        Frozen policies ignore updates.
+        """
+
+    def buffer_update(self, states: List[Tuple[int,int]], actions: List[Action], reward: int) -> None:
+        """
+        Frozen policies ignore the rewards an Agent reports.
+        """
+
+    def buffer_keys(self, keys: List[int], reward: int) -> None:
+        """
+        Frozen policies ignore the rewards an Agent reports.
+        """
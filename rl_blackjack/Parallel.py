@@ -0,0 +1,181 @@
+import numpy as np
+from multiprocessing.pool import Pool
+from Actions import Action
+from Agent import Agent
+from Dealer import Dealer
+from Deals import RecordingShoe, ReplayShoe
+from Metrics import metrics
+from MonteCarlo import FrozenPolicy, MonteCarlo, ACTION_INDEX
+from Rng import BufferedRandom
+from Shoe import Shoe
+from Stats import StreamingStats
+from Table import Table
+from typing import List, Optional, Tuple
+
+# Episodes are played in fixed-size chunks, each with its own seed, so the result of a
+# generation does not depend on how many worker processes the chunks are spread over.
+# Each chunk deals from a new shoe shuffled from its seed, so with a penetration the shoe in play
+# at the end of a chunk is never finished: every chunk boundary is a reshuffle. For a chunk of
+# 10000 hands this cuts short one of the hundreds of shoes it deals (about 240 with six decks
+# at 0.75, more with fewer decks or more seats), a small departure from dealing every hand from
+# one continuous shoe.
+CHUNK_SIZE = 10000
+
+class ReturnTotals(MonteCarlo):
+    """
+    Stand-in policy for worker processes. Follows the on-policy actions it was given and,
+    instead of updating running averages, adds up visit counts and rewards for MonteCarlo.merge.
+    """
+    def __init__(self, action_table: np.ndarray):
+        super().__init__()
+        self.action_table[:] = action_table
+        self.returns = np.zeros_like(self.values)
+
+    def update(self, state: Tuple[int,int], action: Action, reward: int) -> None:
+        hand, dealer = state
+        index = ACTION_INDEX[action]
+        self.counts[hand, dealer, index] += 1
+        self.returns[hand, dealer, index] += reward
+
+    def merge_pairs(self, keys: np.ndarray, counts: np.ndarray, returns: np.ndarray) -> None:
+        self.counts.reshape(-1)[keys] += counts
+        self.returns.reshape(-1)[keys] += returns
+
+def chunk_seed(seed: int, *keys: int) -> int:
+    """
+    Derive an independent seed for one chunk, e.g. chunk_seed(seed, generation, chunk).
+    """
+    return int(np.random.SeedSequence([seed, *keys]).generate_state(1)[0])
+
+def play_chunk(task: Tuple[np.ndarray, int, int, int, float, int, bool]) -> Tuple[np.ndarray, np.ndarray, Tuple[int, int, int], dict]:
+    """
+    Play one chunk of training episodes with its own Table, Agent and Shoe. The shoe starts
+    freshly shuffled rather than where the previous chunk's left off (see CHUNK_SIZE).
+    :param task: Tuple of (on-policy action table, episodes, seed, number of decks, penetration, seats, collect metrics).
+    :return: Visit counts and summed rewards per [agent hand, dealer card, action], the seats' (wins, losses, draws)
+             and the chunk's metrics snapshot.
+    """
+    action_table, episodes, seed, num_decks, penetration, seats, collect_metrics = task
+    metrics.enabled = collect_metrics
+    metrics.reset()
+    shoe = Shoe(num_decks, penetration, rng=BufferedRandom(seed))
+    dealer = Dealer(shoe)
+    table = Table(shoe, dealer)
+    totals = ReturnTotals(action_table)
+    for _ in range(seats):
+        table.add(Agent(totals))
+    for _ in range(episodes):
+        table.dealInitial()
+        table.playEpisode()
+        table.reset()
+    totals.flush_updates()
+    return totals.counts, totals.returns, (table.wins, table.losses, table.draws), metrics.snapshot()
+
+def play_generation(pool: Optional[Pool], policy: MonteCarlo, episodes: int, seed: int, generation: int,
+                    num_decks: int = 1, penetration: float = None, seats: int = 1) -> Tuple[int, int, int]:
+    """
+    Play one generation of training episodes across a process pool and merge the results into the policy.
+    :param pool: Worker processes to run the chunks on, or None to play them in this process.
+    :param policy: Shared policy. Its current on-policy actions are sent to the workers.
+    :param episodes: Total number of episodes in the generation.
+    :param seed: Base seed for the run.
+    :param generation: Index of the generation, used to derive the chunk seeds.
+    :param seats: Number of seats at each chunk's table, all following the same policy.
+    :return: Wins, losses and draws over every seat and chunk.
+    """
+    tasks = []
+    for chunk, start in enumerate(range(0, episodes, CHUNK_SIZE)):
+        size = min(CHUNK_SIZE, episodes - start)
+        tasks.append((policy.action_table, size, chunk_seed(seed, generation, chunk), num_decks, penetration,
+                      seats, metrics.enabled))
+
+    if pool is not None:
+        results = pool.map(play_chunk, tasks)
+    else:
+        # Each chunk resets the registry it records into, which here is this process's own.
+        # Set its contents aside and add the chunks' snapshots to them below.
+        earlier = metrics.snapshot(reset=True)
+        results = [play_chunk(task) for task in tasks]
+        metrics.reset()
+        metrics.merge(earlier)
+
+    counts = np.zeros_like(policy.counts)
+    returns = np.zeros_like(policy.values)
+    outcomes = np.zeros(3, dtype=np.int64)
+    for chunk_counts, chunk_returns, chunk_outcomes, chunk_metrics in results:
+        counts += chunk_counts
+        returns += chunk_returns
+        outcomes += chunk_outcomes
+        if metrics.enabled:
+            metrics.merge(chunk_metrics)
+    policy.merge(counts, returns)
+    wins, losses, draws = outcomes.tolist()
+    return wins, losses, draws
+
+def evaluation_shoe(num_decks: int = 1, penetration: float = None, rng: BufferedRandom = None,
+                    deals: Optional[Tuple[str, int, bool]] = None) -> Shoe:
+    """
+    Shoe for an evaluation run.
+    :param deals: Optional tuple of (deal file, first hand, record). Records the run's deals into the file
+                  (see Deals.create_deals) if record is set, and otherwise replays the file's hands.
+    """
+    if deals is None:
+        return Shoe(num_decks, penetration, rng=rng)
+    filename, first_hand, record = deals
+    if record:
+        return RecordingShoe(filename, first_hand, num_decks, penetration, rng)
+    return ReplayShoe(filename, first_hand)
+
+def evaluate_chunk(task: Tuple[np.ndarray, int, int, int, float, int, int, bool, Optional[Tuple[str, int, bool]]]) -> Tuple[int, int, int, StreamingStats, dict]:
+    """
+    Play one chunk of evaluation episodes with its own Table, Agent and Shoe.
+    :param task: Tuple of (on-policy action table, episodes, seed, number of decks, penetration, window size, history size,
+                 collect metrics, deals). deals is None, or (deal file, first hand of the chunk, record) as for evaluation_shoe.
+    :return: Wins, losses, draws, the streaming statistics of the results (1, 0.5 or 0) and the chunk's metrics snapshot.
+    """
+    action_table, episodes, seed, num_decks, penetration, window_size, history_size, collect_metrics, deals = task
+    metrics.enabled = collect_metrics
+    metrics.reset()
+    shoe = evaluation_shoe(num_decks, penetration, BufferedRandom(seed), deals)
+    dealer = Dealer(shoe)
+    table = Table(shoe, dealer)
+    agent = Agent(FrozenPolicy(action_table))
+    table.add(agent)
+
+    wins = 0
+    losses = 0
+    draws = 0
+    results = StreamingStats(window_size, history_size)
+    for _ in range(episodes):
+        table.dealInitial()
+        table.playEpisode()
+        agent_val = agent.calculateHand()
+        dealer_val = dealer.calculateHand()
+        if agent_val > 21 or (dealer_val <= 21 and agent_val < dealer_val):
+            losses += 1
+            results.add(0)
+        elif dealer_val > 21 or agent_val > dealer_val:
+            wins += 1
+            results.add(1)
+        else:
+            draws += 1
+            results.add(0.5)
+        table.reset()
+    if deals is not None:
+        shoe.close()
+    return wins, losses, draws, results, metrics.snapshot()
+
+def evaluation_tasks(policy: MonteCarlo, episodes: int, seed: int, window_size: int, history_size: int = 0,
+                     num_decks: int = 1, penetration: float = None,
+                     deals: Optional[Tuple[str, bool]] = None) -> List[Tuple[np.ndarray, int, int, int, float, int, int, bool, Optional[Tuple[str, int, bool]]]]:
+    """
+    Split an evaluation run into seeded chunks for evaluate_chunk.
+    :param deals: Optional tuple of (deal file, record). Each chunk records or replays its own range of hands.
+    """
+    tasks = []
+    for chunk, start in enumerate(range(0, episodes, CHUNK_SIZE)):
+        size = min(CHUNK_SIZE, episodes - start)
+        chunk_deals = None if deals is None else (deals[0], start, deals[1])
+        tasks.append((policy.action_table, size, chunk_seed(seed, chunk), num_decks, penetration, window_size,
+                      history_size, metrics.enabled, chunk_deals))
+    return tasks
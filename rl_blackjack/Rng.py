@@ -0,0 +1,98 @@
+import numpy as np
+from typing import List, MutableSequence, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+# Number of uniform values drawn from the generator at a time
+BLOCK_SIZE = 4096
+
+class BufferedRandom:
+    """
+    Seedable random number source for the simulation.
+
+    Uniform values are drawn from a NumPy PCG64 generator in vectorized blocks and handed out
+    one at a time from a buffer, which is much cheaper per value than a separate call for each
+    card. Every instance has its own stream, so shoes and policies seeded separately (or spawned
+    from one parent) can run side by side, or in parallel processes, reproducibly.
+    """
+
+    def __init__(self, seed: Optional[int | np.random.SeedSequence] = None, block_size: int = BLOCK_SIZE):
+        """
+        :param seed: Seed (or SeedSequence) for the stream. None seeds from fresh OS entropy.
+        :param block_size: Number of values drawn from the generator per refill.
+        """
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.Generator(np.random.PCG64(seed))
+        self.block_size = block_size
+        self._buffer: List[float] = []
+        self._position = 0
+
+    def random(self) -> float:
+        """
+        Next uniform value in [0, 1).
+        """
+        if self._position == len(self._buffer):
+            self._buffer = self.generator.random(self.block_size).tolist()
+            self._position = 0
+        value = self._buffer[self._position]
+        self._position += 1
+        return value
+
+    def uniforms(self, n: int) -> np.ndarray:
+        """
+        Array of n uniform values in [0, 1), drawn from the generator in one vectorized call.
+        """
+        return self.generator.random(n)
+
+    def randbelow(self, n: int) -> int:
+        """
+        Uniform integer in [0, n).
+        """
+        return int(self.random() * n)
+
+    def choice(self, sequence: Sequence[T]) -> T:
+        """
+        Uniformly chosen element of a non-empty sequence.
+        """
+        return sequence[int(self.random() * len(sequence))]
+
+    def shuffle(self, items: MutableSequence) -> None:
+        """
+        Shuffle a sequence in place.
+        """
+        order = self.generator.permutation(len(items))
+        items[:] = [items[index] for index in order]
+
+    def spawn(self, count: int) -> List['BufferedRandom']:
+        """
+        Independent child streams, e.g. one per shoe or per worker.
+        """
+        return [BufferedRandom(child, self.block_size) for child in self.seed_sequence.spawn(count)]
+
+    def getstate(self) -> tuple:
+        """
+        Generator state and unread buffer, for setstate.
+        """
+        return (self.generator.bit_generator.state, self._buffer[self._position:])
+
+    def setstate(self, state: tuple) -> None:
+        """
+        Restore a state saved by getstate, so the stream continues exactly where it was.
+        """
+        generator_state, buffer = state
+        self.generator.bit_generator.state = generator_state
+        self._buffer = list(buffer)
+        self._position = 0
+
+
+if __name__ == "__main__":
+    rng = BufferedRandom(seed=42)
+    print([round(rng.random(), 3) for _ in range(5)])
+    state = rng.getstate()
+    first = [rng.random() for _ in range(3)]
+    rng.setstate(state)
+    print(first == [rng.random() for _ in range(3)])
+    shoe_rng, policy_rng = rng.spawn(2)
+    print(round(shoe_rng.random(), 3), round(policy_rng.random(), 3))
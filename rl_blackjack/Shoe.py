@@ -1,4 +1,6 @@
-import random
+from Cards import CARD_NAMES, CARDS_PER_DECK
+from Metrics import metrics
+from Rng import BufferedRandom
 
 class Shoe:
     """
@@ -6,22 +8,35 @@ class Shoe:
     
     Attributes:
     ----------
-    deck : dict
-        Dictionary representing the number of each card value left in the shoe.
+    deck : list[int]
+        Number of each card left in the shoe, indexed by card code (see Cards.py).
+
+    penetration : float or None
+        Fraction of the shoe dealt before the cut card is reached. If None, every draw is
+        sampled from the remaining counts and reset() refills the shoe after each hand.
+        Otherwise the shoe is shuffled once and dealt in order, and reset() only reshuffles
+        once the cut card has been reached.
+
+    rng : BufferedRandom
+        Random source for draws and shuffles.
         
     Methods:
     -------
-    createDeck(num_decks: int) -> dict[str, int]:
-        Creates a dictionary representing the shoe with the specified number of decks.
+    createDeck(num_decks: int) -> list[int]:
+        Creates the card counts for a shoe with the specified number of decks.
     
-    drawCard() -> str:
+    shuffle() -> None:
+        Refills the shoe and shuffles it into a card sequence (penetration mode).
+
+    drawCard() -> int:
         Randomly draws a card from the shoe, reducing its count by one.
     
     isEmpty() -> bool:
         Checks if the shoe is empty (i.e., no cards left).
     """
+    __slots__ = ('num_decks', 'penetration', 'rng', 'full_deck', 'deck', 'cards', 'position', 'cut_card')
     
-    def __init__(self, num_decks: int = 1):
+    def __init__(self, num_decks: int = 1, penetration: float | None = None, rng: BufferedRandom | None = None):
         """
         Initializes the Shoe class.
         
@@ -29,15 +44,32 @@ class Shoe:
         ----------
         num_decks : int
             The number of decks used to create the shoe. Defaults to 1 deck.
+
+        penetration : float or None
+            Fraction of the shoe (0 to 1) to deal before reshuffling. Defaults to None,
+            which refills the shoe after every hand.
+
+        rng : BufferedRandom or None
+            Random source to draw and shuffle with. Defaults to a new, unseeded one.
         """
+        if penetration is not None and not 0 < penetration <= 1:
+            raise ValueError("Penetration must be between 0 and 1.")
+
         # Initialize the deck with the specified number of decks
         self.num_decks=num_decks
-        self.deck = self.createDeck(self.num_decks)
+        self.penetration = penetration
+        self.rng = rng if rng is not None else BufferedRandom()
+        self.full_deck = self.createDeck(self.num_decks) # Copied back into self.deck when the shoe is refilled
+        self.deck = list(self.full_deck)
+        self.cards: list[int] = []
+        self.position = 0
+        self.cut_card = 0
+        if self.penetration is not None:
+            self.shuffle()
 
-    def createDeck(self, num_decks: int) -> dict[str, int]:
+    def createDeck(self, num_decks: int) -> list[int]:
         """
-        Creates a shoe (dictionary) representing the total number of each card value 
-        based on the number of decks.
+        Creates the total number of each card in the shoe based on the number of decks.
         
         Parameters:
         ----------
@@ -46,37 +78,60 @@ class Shoe:
         
         Returns:
         -------
-        dict[str, int]
-            A dictionary where keys are card values ('2' to 'A') and values are the 
-            number of that card in the shoe.
+        list[int]
+            The number of each card in the shoe, indexed by card code ('2' to 'A').
         """
         # Standard deck: 4 of each card from 2-9, 16 of the '10' (including face cards), and 4 Aces.
-        cards_per_deck = {
-            '2': 4, '3': 4, '4': 4, '5': 4, 
-            '6': 4, '7': 4, '8': 4, '9': 4,
-            '10': 16, 'A': 4  # 10 includes ten, jack, queen, king
-        }
-
         # Multiply the number of each card by the number of decks
-        shoe = {card: count * num_decks for card, count in cards_per_deck.items()}
-        
-        return shoe
+        return [count * num_decks for count in CARDS_PER_DECK]
+
+    def shuffle(self) -> None:
+        """
+        Refills the shoe and shuffles every card into a sequence that drawCard deals in order.
+        The cut card is placed after the penetration fraction of the sequence.
+        """
+        self.deck[:] = self.full_deck
+        self.cards = [card for card, count in enumerate(self.deck) for _ in range(count)]
+        self.rng.shuffle(self.cards)
+        self.position = 0
+        self.cut_card = int(len(self.cards) * self.penetration)
 
-    def drawCard(self) -> str:
+    def drawCard(self) -> int:
         """
         Draws a random card from the shoe, reducing its count by one.
         
         Returns:
         -------
-        str
-            The value of the drawn card.
+        int
+            The code of the drawn card.
         """
-        # Get the list of cards with their current counts (only cards with counts > 0)
-        cards, counts = zip(*[(card, count) for card, count in self.deck.items() if count > 0])
-        
-        # Randomly select a card based on the remaining counts (weighted random selection)
-        drawn_card = random.choices(cards, counts)[0]
-        
+        if metrics.enabled:
+            metrics.count("cards_drawn")
+        if self.penetration is not None:
+            # Deal the next card in the shuffled sequence. Running out mid-hand forces a reshuffle.
+            if self.position == len(self.cards):
+                self.shuffle()
+                if metrics.enabled:
+                    metrics.count("mid_hand_shuffles")
+            drawn_card = self.cards[self.position]
+            self.position += 1
+            self.deck[drawn_card] -= 1
+            return drawn_card
+
+        # Weighted random selection: walk the counts until the target position is passed
+        remaining = sum(self.deck)
+        if remaining == 0:
+            # Only possible with many seats at the table. Refill, as the penetration mode reshuffles.
+            self.deck[:] = self.full_deck
+            remaining = sum(self.deck)
+            if metrics.enabled:
+                metrics.count("mid_hand_shuffles")
+        target = self.rng.randbelow(remaining)
+        for drawn_card, count in enumerate(self.deck):
+            if target < count:
+                break
+            target -= count
+
         # Reduce the count of the drawn card in the shoe
         self.deck[drawn_card] -= 1
         
@@ -91,8 +146,11 @@ class Shoe:
         bool
             True if the shoe is empty, False otherwise.
         """
+        if self.penetration is not None:
+            return self.position == len(self.cards)
+
         # Sum the counts of all cards. If the total is greater than zero, the shoe is not empty.
-        if sum(self.deck.values()) > 0:
+        if sum(self.deck) > 0:
             return False
         return True
 
@@ -103,18 +161,46 @@ class Shoe:
         print("Current Shoe Composition:")
         # Determine the width for the 'count' column.
         space_between = 40
-        for card, count in self.deck.items():
+        for card, count in enumerate(self.deck):
             bar = '█' * count
-            print(f"{card:>2}: {bar:<{space_between}} ({count:>{3}})")
+            print(f"{CARD_NAMES[card]:>2}: {bar:<{space_between}} ({count:>{3}})")
+
+    def getState(self) -> tuple:
+        """
+        Returns the shoe's contents and dealing position, for setState.
+        """
+        return (list(self.deck), list(self.cards), self.position, self.cut_card)
+
+    def setState(self, state: tuple) -> None:
+        """
+        Restores the contents and dealing position saved by getState.
+        """
+        deck, cards, self.position, self.cut_card = state
+        self.deck[:] = deck
+        self.cards = list(cards)
 
     def reset(self):
-        self.deck = self.createDeck(self.num_decks)
+        """
+        Prepares the shoe for the next hand. Without penetration the shoe is refilled;
+        with penetration it is only reshuffled once the cut card has been dealt.
+        """
+        if self.penetration is None:
+            self.deck[:] = self.full_deck
+        elif self.position >= self.cut_card:
+            self.shuffle()
+            if metrics.enabled:
+                metrics.count("shuffles")
 
 
 if __name__ == "__main__":
     # Example usage
     test = Shoe(num_decks=2)  # Create a shoe with 2 decks
     print(test.deck)          # Print the initial deck
-    print(test.drawCard())    # Draw a card and print the drawn card
+    print(CARD_NAMES[test.drawCard()])  # Draw a card and print the drawn card
     test.showShoe()
+
+    # A six deck shoe, reshuffled after three quarters have been dealt
+    persistent = Shoe(num_decks=6, penetration=0.75)
+    print([CARD_NAMES[persistent.drawCard()] for _ in range(10)])
+    print(f"{persistent.position} of {len(persistent.cards)} cards dealt, cut card at {persistent.cut_card}")
     
@@ -0,0 +1,139 @@
+import math
+from collections import deque
+from typing import List, Tuple
+
+class StreamingStats:
+    """
+    Running statistics over a stream of values, updated in O(1) time per value with bounded memory.
+
+    Keeps the count, mean and variance of every value seen (Welford's method), the sum of the last
+    window_size values, and optionally a fixed-size history of the windowed mean. History entries
+    are taken after every history_step values, i.e. at the values whose position in the stream is
+    a multiple of history_step. When the history fills up every other entry is dropped and the
+    sampling interval doubles, so it always covers the whole stream.
+    """
+
+    def __init__(self, window_size: int = 1000, history_size: int = 0):
+        """
+        :param window_size: Number of most recent values in the windowed mean.
+        :param history_size: Maximum number of windowed means to keep. 0 keeps no history.
+        """
+        self.window_size = window_size
+        self.history_size = history_size
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0  # Sum of squared differences from the mean
+        self.window: deque = deque(maxlen=window_size)
+        self.window_total = 0.0
+        self.history: List[float] = []
+        self.history_step = 1  # Values between history entries, always a power of two
+        self._since_history = 0  # Values since the last entry, i.e. count % history_step
+
+    def add(self, value: float) -> None:
+        """
+        Add a value to the stream.
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+        if len(self.window) == self.window_size:
+            self.window_total -= self.window[0]
+        self.window.append(value)
+        self.window_total += value
+
+        if self.history_size:
+            self._since_history += 1
+            if self._since_history == self.history_step:
+                self._since_history = 0
+                self.history.append(self.window_mean())
+                if len(self.history) == self.history_size:
+                    self._thin_history()
+
+    def _thin_history(self) -> None:
+        """
+        Keep every other history entry (those at multiples of twice the step) and double the step.
+        """
+        self.history = self.history[1::2]
+        self.history_step *= 2
+        self._since_history = self.count % self.history_step
+
+    def window_mean(self) -> float:
+        """
+        Mean of the last window_size values (or of every value, if fewer have been seen).
+        """
+        if not self.window:
+            return 0.0
+        return self.window_total / len(self.window)
+
+    def variance(self) -> float:
+        """
+        Sample variance of every value seen.
+        """
+        if self.count < 2:
+            return 0.0
+        return self._m2 / (self.count - 1)
+
+    def confidence_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """
+        Normal-approximation confidence interval for the mean.
+        :param z: Number of standard errors on each side. Defaults to 1.96 (95%).
+        :return: Tuple of (low, high).
+        """
+        if self.count == 0:
+            return (0.0, 0.0)
+        margin = z * math.sqrt(self.variance() / self.count)
+        return (self.mean - margin, self.mean + margin)
+
+    def merge(self, other: 'StreamingStats') -> None:
+        """
+        Combine another stream into this one, as if its values had been added after this stream's.
+
+        Both histories are brought to the larger of the two steps, at the positions that step
+        samples in the combined stream. Each of those positions in the other stream takes the other
+        history's latest entry at or before it, which is at most one of its steps earlier. As the
+        other stream's windowed means start without this stream's last values, its first
+        window_size values' entries are approximate.
+        """
+        if other.count == 0:
+            return
+        offset = self.count
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+        for value in other.window:
+            if len(self.window) == self.window_size:
+                self.window_total -= self.window[0]
+            self.window.append(value)
+            self.window_total += value
+
+        if self.history_size:
+            step = max(self.history_step, other.history_step)
+            ratio = step // self.history_step
+            self.history = self.history[ratio - 1::ratio]
+            self.history_step = step
+            if other.history:
+                # The other history's entry j was taken at position offset + (j + 1) * other.history_step
+                last = len(other.history) - 1
+                for position in range((offset // step + 1) * step, count + 1, step):
+                    index = min(max((position - offset) // other.history_step - 1, 0), last)
+                    self.history.append(other.history[index])
+            self._since_history = count % step
+            while len(self.history) >= self.history_size:
+                self._thin_history()
+
+
+if __name__ == "__main__":
+    from random import random
+
+    stats = StreamingStats(window_size=100, history_size=10)
+    for _ in range(10000):
+        stats.add(1 if random() < 0.4 else 0)
+    low, high = stats.confidence_interval()
+    print(f"Mean: {stats.mean:.3f} (95% CI {low:.3f}-{high:.3f}), variance: {stats.variance():.3f}")
+    print(f"Last {stats.window_size}: {stats.window_mean():.3f}")
+    print(f"History (every {stats.history_step} values): {[round(h, 2) for h in stats.history]}")
@@ -1,12 +1,16 @@
 from Actions import Action
 from Agent import Agent
+from Cards import CARD_NAMES
 from Dealer import Dealer
+from Metrics import metrics, clock
 from MonteCarlo import MonteCarlo
 from Shoe import Shoe
 from tqdm import tqdm
-from typing import List
+from typing import List, Set
 
 class Table:
+    __slots__ = ('agents', 'shoe', 'dealer', 'current_turn', 'initial_winners', 'wins', 'losses', 'draws')
+
     def __init__(self, shoe: Shoe, dealer: Dealer):
         """
         Initialize the table with a shoe and a dealer.
@@ -15,6 +19,11 @@ class Table:
         self.shoe = shoe
         self.dealer = dealer
         self.current_turn = 0
+        self.initial_winners: Set[Agent] = set() # Agents dealt a natural this hand, refilled by playEpisode
+        # Running totals of seat results, over every hand played at this table
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
 
     def add(self, agent:Agent) -> None:
         """
@@ -26,60 +35,119 @@ class Table:
         """
         Dealer deals to the table.
         """
+        if metrics.enabled:
+            start = clock()
         for agent in self.agents:
             self.dealer.deal(agent)
             self.dealer.deal(agent)
         # Dealer draws last
         self.dealer.drawInitial()
+        if metrics.enabled:
+            metrics.add_time("deal", clock() - start)
 
     def playEpisode(self) -> None:
         """
         Each agent takes a turn, then the dealer plays.
         """
+        timed = metrics.enabled
+        if timed:
+            metrics.count("hands")
         dealer_hand_full = self.dealer.calculateHand()
         dealer_hand_hide = self.dealer.calculateHand(True)
-        initial_winners = [agent for agent in self.agents if agent.calculateHand() == 21]
+        initial_winners = self.initial_winners
+        initial_winners.clear()
+        for agent in self.agents:
+            if agent.calculateHand() == 21:
+                initial_winners.add(agent)
         for agent in self.agents:
             agent.stateUpdate(dealer_hand_hide)
         if dealer_hand_full == 21:
+            if timed:
+                metrics.count("dealer_naturals")
             for agent in self.agents:
                 if agent in initial_winners:
-                    agent.rewardUpdate(agent.draw_reward)
+                    self.draws += 1
+                    reward = agent.draw_reward
+                else:
+                    self.losses += 1
+                    reward = agent.loss_reward
+                if timed:
+                    start = clock()
+                    agent.rewardUpdate(reward)
+                    metrics.add_time("rewards", clock() - start)
                 else:
-                    agent.rewardUpdate(agent.loss_reward)
+                    agent.rewardUpdate(reward)
             return
         elif initial_winners:
-            for agent in initial_winners:
-                agent.rewardUpdate(agent.win_reward)
-            return
+            if timed:
+                metrics.count("agent_naturals")
+            for agent in self.agents: # Seat order, as the set is unordered
+                if agent in initial_winners:
+                    self.wins += 1
+                    if timed:
+                        start = clock()
+                        agent.rewardUpdate(agent.win_reward)
+                        metrics.add_time("rewards", clock() - start)
+                    else:
+                        agent.rewardUpdate(agent.win_reward)
+            if len(initial_winners) == len(self.agents):
+                return
+            # The other seats play the hand out against the dealer
 
+        # Agent turns (the time includes the reward update of agents that bust)
+        if timed:
+            start = clock()
         for agent in self.agents:
+            if agent in initial_winners:
+                continue
             action=Action.HIT
             while action != Action.STAND:
                 action = agent.playTurn(dealer_hand_hide)
                 if action == Action.HIT:
+                    if timed:
+                        metrics.count("agent_hits")
                     self.dealer.deal(agent)
                     agent.stateUpdate(dealer_hand_hide)
                     if agent.calculateHand() > 21:
-                        agent.rewardUpdate(agent.loss_reward)
+                        if timed:
+                            metrics.count("agent_busts")
+                            reward_start = clock()
+                            agent.rewardUpdate(agent.loss_reward)
+                            metrics.add_time("rewards", clock() - reward_start)
+                        else:
+                            agent.rewardUpdate(agent.loss_reward)
                         break
             agent.stateUpdate(dealer_hand_hide)
+        if timed:
+            metrics.add_time("agent_turns", clock() - start)
 
-        if any(agent.calculateHand() <= 21 for agent in self.agents):
+        if any(agent.calculateHand() <= 21 for agent in self.agents if agent not in initial_winners):
             self.dealer.playTurn()
 
         dealer_hand_final = self.dealer.calculateHand()
         for agent in self.agents:
+            if agent in initial_winners:
+                continue
             agent.stateUpdate(dealer_hand_final)
             agent_hand = agent.calculateHand()
             if agent_hand > 21:
-                agent.rewardUpdate(agent.loss_reward)
+                self.losses += 1
+                reward = agent.loss_reward
             elif dealer_hand_final > 21 or agent_hand > dealer_hand_final:
-                agent.rewardUpdate(agent.win_reward)
+                self.wins += 1
+                reward = agent.win_reward
             elif agent_hand == dealer_hand_final:
-                agent.rewardUpdate(agent.draw_reward)
+                self.draws += 1
+                reward = agent.draw_reward
+            else:
+                self.losses += 1
+                reward = agent.loss_reward
+            if timed:
+                start = clock()
+                agent.rewardUpdate(reward)
+                metrics.add_time("rewards", clock() - start)
             else:
-                agent.rewardUpdate(agent.loss_reward)
+                agent.rewardUpdate(reward)
 
                 
     def reset(self) -> None:
@@ -111,15 +179,15 @@ if __name__ == "__main__":
 
             # Print each agent's initial hand
             for i, agent in enumerate(table.agents):
-                print(f"Agent {i+1} initial hand:", agent.hand)
-            print(f"Dealer initial hand: {dealer.checkHand()}\n")
+                print(f"Agent {i+1} initial hand:", [CARD_NAMES[card] for card in agent.hand])
+            print(f"Dealer initial hand: {[CARD_NAMES[card] for card in dealer.checkHand()]}\n")
 
             table.playEpisode()
 
             # Show final hands and values
-            print("Dealer's final hand: ", "Value:", dealer.calculateHand()," | ", dealer.hand)
+            print("Dealer's final hand: ", "Value:", dealer.calculateHand()," | ", [CARD_NAMES[card] for card in dealer.hand])
             for i, agent in enumerate(table.agents):
-                print(f"Agent {i+1}'s final hand:", "Value:", agent.calculateHand()," | ", agent.hand)
+                print(f"Agent {i+1}'s final hand:", "Value:", agent.calculateHand()," | ", [CARD_NAMES[card] for card in agent.hand])
                 #print(agent.policy.policy)
             table.reset()
 
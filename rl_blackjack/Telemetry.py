@@ -0,0 +1,126 @@
+import csv
+import json
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Optional
+
+class TelemetryWriter:
+    """
+    Streams structured records (e.g. one per training generation) to a JSONL or CSV file.
+
+    write() only puts the record on a queue. A background thread collects queued records into
+    batches and appends them to the file, so the simulation loop never waits on disk I/O.
+    Records are flushed once batch_size have been collected, every flush_interval seconds
+    while any are pending, and on close().
+
+    A CSV file has a single header, so it holds one kind of record: every record must have the
+    fields of the first one, or of the header already in the file when appending to it.
+    """
+
+    def __init__(self, path: str, format: Optional[str] = None, batch_size: int = 64, flush_interval: float = 1.0):
+        """
+        :param path: File to append the records to.
+        :param format: 'jsonl' or 'csv'. Defaults to 'csv' for a .csv path and 'jsonl' otherwise.
+        :param batch_size: Number of records written per batch.
+        :param flush_interval: Maximum number of seconds a record waits before being written.
+        """
+        if format is None:
+            format = 'csv' if path.endswith('.csv') else 'jsonl'
+        if format not in ('jsonl', 'csv'):
+            raise ValueError("Telemetry format must be 'jsonl' or 'csv'.")
+        self.path = path
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.error: Optional[BaseException] = None
+        # Fields of the CSV header, taken from the file when appending to one that has it
+        self.fields: Optional[List[str]] = None
+        if format == 'csv' and os.path.exists(path):
+            with open(path, newline='') as f:
+                self.fields = next(csv.reader(f), None)
+        # Opened here, so a bad path fails in the caller rather than in the writer thread
+        self._file = open(path, 'a', newline='')
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="TelemetryWriter", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """
+        Queue a record for writing. Never blocks.
+        """
+        self._queue.put_nowait(record)
+
+    def close(self) -> None:
+        """
+        Write every queued record and stop the writer thread.
+        Raises the writer's error, if writing failed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> 'TelemetryWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """
+        Writer thread. Runs until close() queues the None sentinel.
+        """
+        writer: Optional[csv.DictWriter] = None
+        with self._file as f:
+            done = False
+            while not done:
+                batch: List[Dict[str, Any]] = []
+                try:
+                    record = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                while True:
+                    if record is None:
+                        done = True
+                        break
+                    batch.append(record)
+                    if len(batch) == self.batch_size:
+                        break
+                    try:
+                        record = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if not batch or self.error is not None:
+                    continue
+                try:
+                    if self.format == 'jsonl':
+                        f.writelines(json.dumps(record) + "\n" for record in batch)
+                    else:
+                        if writer is None:
+                            if self.fields is None:
+                                self.fields = list(batch[0])
+                            writer = csv.DictWriter(f, fieldnames=self.fields)
+                            if f.tell() == 0:
+                                writer.writeheader()
+                        for record in batch:
+                            if list(record) != self.fields:
+                                raise ValueError(f"{self.path} holds CSV records with the fields {self.fields}, "
+                                                 f"not {list(record)}; write other kinds of record to another file.")
+                        writer.writerows(batch)
+                    f.flush()
+                except Exception as error:
+                    # Keep draining the queue so write() stays non-blocking; close() reports the error.
+                    self.error = error
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    path = os.path.join(tempfile.mkdtemp(), "telemetry.jsonl")
+    with TelemetryWriter(path) as telemetry:
+        for generation in range(5):
+            telemetry.write({'generation': generation + 1, 'time': time.time()})
+    with open(path) as f:
+        print(f.read())
@@ -1,104 +1,264 @@
 import matplotlib
 matplotlib.use("Agg")  # Use non-interactive backend
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
+import argparse
+import csv
+import glob
+import json
 import numpy as np
-from Shoe import Shoe
-from Agent import Agent
-from Dealer import Dealer
+import os
+import re
+import shutil
+import subprocess
+from collections import deque
+from multiprocessing import Pool
+from PIL import GifImagePlugin, Image, ImageChops
+from BatchTable import BatchTable
 from MonteCarlo import MonteCarlo
-from Table import Table
+from Shoe import Shoe
+from typing import Iterator, List, Optional, Tuple
+
+# Snapshot files saved with --snapshot-every are named <policy>.gen<generation>.mcpolicy
+SNAPSHOT_PATTERN = re.compile(r"\.gen(\d+)$")
+
+# Resolution of full renders, and of previews, in dots per inch of the default 6.4 x 4.8 inch figure
+DPI = 100
+PREVIEW_DPI = 40
+# Previews show at most this many frames, sampled evenly over the run
+PREVIEW_FRAMES = 120
+# Frames drawn per worker task
+FRAMES_PER_TASK = 32
+# Tasks submitted ahead of the one being written, per worker. Frames are written as they arrive
+# and no more tasks are submitted until a slot is free, so at most this many tasks' frames per
+# worker are held in memory, however long the run.
+TASKS_PER_WORKER = 2
+# Snapshots are evaluated on the deals of this seed unless another is given
+SNAPSHOT_SEED = 0
+
+def read_telemetry(path: str) -> Tuple[List[int], List[float]]:
+    """
+    Read the training records of a telemetry file (JSON lines, or CSV for a .csv path).
+    :return: Generations and their win rates, with draws counting half.
+    """
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            records = list(csv.DictReader(f))
+        else:
+            records = [json.loads(line) for line in f if line.strip()]
+
+    generations = []
+    win_rates = []
+    for record in records:
+        if record['kind'] != 'train':
+            continue
+        wins, losses, draws = (int(record[name]) for name in ('wins', 'losses', 'draws'))
+        generations.append(int(record['generation']))
+        win_rates.append((wins + draws / 2) / max(wins + losses + draws, 1))
+    return generations, win_rates
+
+def evaluate_snapshots(policy_names: List[str], episodes: int = 100000, num_decks: int = 1,
+                       seed: int = SNAPSHOT_SEED) -> Tuple[List[int], List[float]]:
+    """
+    Evaluate saved policy snapshots with BatchTable. BatchTable deals and scores hands as Table
+    does, so the win rates are Table's for the snapshots' actions; only its training updates
+    differ from Table's, and snapshots are never trained here.
+    :param policy_names: Snapshot filenames (without the .mcpolicy extension), ending in .gen<generation>.
+    :param episodes: Number of hands to play per snapshot.
+    :param seed: Seed of the deals every snapshot plays.
+    :return: Generations and their win rates, with draws counting half.
+    """
+    snapshots = sorted((int(SNAPSHOT_PATTERN.search(name).group(1)), name) for name in policy_names)
+    generations = []
+    win_rates = []
+    for generation, name in snapshots:
+        policy = MonteCarlo()
+        policy.load_binary(name, mmap=True)
+        # With one seed BatchTable deals every snapshot the same hands, so differences come from the policies alone.
+        wins, losses, draws = BatchTable(Shoe(num_decks), policy, seed).playEpisodes(episodes).outcomes()
+        generations.append(generation)
+        win_rates.append((wins + draws / 2) / episodes)
+    return generations, win_rates
+
+# Figure, background and line of the worker process, set up once by _init_worker
+_canvas = None
+
+def _draw_figure(generations: List[int], dpi: int):
+    """
+    Draw the static parts of the plot.
+    :return: The figure and the (empty) win rate line.
+    """
+    fig, ax = plt.subplots(dpi=dpi)
+    line, = ax.plot([], [], label="Win Rate")
+    ax.set_xlim(0, max(generations, default=1))
+    ax.set_ylim(0, 1)
+    ax.set_title("Agent Win Rate Over Generations")
+    ax.set_xlabel("Generation")
+    ax.set_ylabel("Win Rate")
+    ax.legend()
+    return fig, line
+
+def _init_worker(generations: List[int], win_rates: List[float], dpi: int) -> None:
+    global _canvas
+    fig, line = _draw_figure(generations, dpi)
+    line.set_animated(True) # Left out of the background, and drawn over it in each frame
+    fig.canvas.draw()
+    background = fig.canvas.copy_from_bbox(fig.bbox)
+    _canvas = (fig, line, background, generations, win_rates)
+
+def _render_frames(frames: List[int]) -> List[bytes]:
+    """
+    Worker task. Draw the given frames over the cached background.
+    :param frames: Frame numbers; frame n shows the data up to and including index n.
+    :return: Raw RGBA pixels of each frame.
+    """
+    fig, line, background, generations, win_rates = _canvas
+    images = []
+    for frame in frames:
+        fig.canvas.restore_region(background)
+        line.set_data(generations[:frame + 1], win_rates[:frame + 1])
+        line.axes.draw_artist(line)
+        images.append(bytes(fig.canvas.buffer_rgba()))
+    return images
+
+def _render_in_order(pool: Pool, tasks: List[List[int]], in_flight: int) -> Iterator[List[bytes]]:
+    """
+    Render the tasks on the pool, keeping at most in_flight of them submitted at a time.
+    :return: Iterator over each task's frames, in task order.
+    """
+    pending = deque()
+    for task in tasks:
+        if len(pending) == in_flight:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(_render_frames, (task,)))
+    while pending:
+        yield pending.popleft().get()
 
 class Visualizer:
-    def __init__(self, generation_count, episode_count, epsilon, save_path="training_visualization.mp4"):
-        self.generation_count = generation_count
-        self.episode_count = episode_count
-        self.epsilon = epsilon
+    """
+    Animates recorded win rates over the generations of a training run. The data comes from a
+    telemetry file or from evaluating policy snapshots, so the video can be rendered (and
+    re-rendered) separately from training.
+
+    Frames are drawn by worker processes, each blitting the line onto a pre-rendered background,
+    and streamed in order as raw pixels to a single ffmpeg process. GIF output is encoded frame by
+    frame with Pillow instead, so it does not need ffmpeg.
+    """
+
+    def __init__(self, generations: List[int], win_rates: List[float], save_path: str = "training_visualization.mp4",
+                 fps: int = 5, preview: bool = False, workers: Optional[int] = None):
+        """
+        :param fps: Frames (generations) shown per second.
+        :param preview: Render a quick low-resolution preview, with at most PREVIEW_FRAMES frames.
+        :param workers: Number of rendering processes. Defaults to the number of CPUs.
+        """
+        self.generations = generations
+        self.win_rates = win_rates
         self.save_path = save_path
+        self.fps = fps
+        self.preview = preview
+        self.workers = workers or os.cpu_count()
 
-        # Initialize win rates and generations
-        self.win_rates = []
-        self.generations = []
-
-        # Set up the plot
-        self.fig, self.ax = plt.subplots()
-        self.line, = self.ax.plot([], [], label="Win Rate")
-        self.ax.set_xlim(0, generation_count)
-        self.ax.set_ylim(0, 1)
-        self.ax.set_title("Agent Win Rate Over Generations")
-        self.ax.set_xlabel("Generation")
-        self.ax.set_ylabel("Win Rate")
-        self.ax.legend()
-
-        # Set up the blackjack environment
-        self.shoe = Shoe()
-        self.dealer = Dealer(self.shoe)
-        self.table = Table(self.shoe, self.dealer)
-        self.policy = MonteCarlo()
-        self.agent = Agent(self.policy)
-        self.table.add(self.agent)
-
-    def update_plot(self, generation, win_rate):
-        """Update data and redraw the plot."""
-        self.generations.append(generation)
-        self.win_rates.append(win_rate)
-        self.line.set_data(self.generations, self.win_rates)
-
-    def play_generation(self, generation):
-        """Simulates a generation and computes the win rate."""
-        print(f"Starting generation {generation + 1}...")
-        self.policy.update_actions(self.epsilon)
-        wins = 0
-
-        for _ in range(self.episode_count):
-            self.table.dealInitial()
-            self.table.playEpisode()  # Assume this returns the winner
-
-            agent_val = self.agent.calculateHand()
-            dealer_val = self.dealer.calculateHand()
-
-            if agent_val > 21:
-                wins += 0
-            elif dealer_val > 21:
-                wins += 1
-            elif agent_val > dealer_val:
-                wins += 1
-            elif agent_val < dealer_val:
-                wins += 0
-            else:
-                wins += 0.5
-            self.table.reset()
+    @classmethod
+    def from_telemetry(cls, path: str, save_path: str = "training_visualization.mp4", **kwargs) -> 'Visualizer':
+        return cls(*read_telemetry(path), save_path, **kwargs)
 
-        win_rate = wins / self.episode_count
-        print(f"Generation {generation + 1} complete. Win rate: {win_rate:.2f}")
-        return win_rate
+    @classmethod
+    def from_snapshots(cls, policy_names: List[str], episodes: int = 100000, num_decks: int = 1,
+                       seed: int = SNAPSHOT_SEED, save_path: str = "training_visualization.mp4", **kwargs) -> 'Visualizer':
+        return cls(*evaluate_snapshots(policy_names, episodes, num_decks, seed), save_path, **kwargs)
+
+    def frames(self) -> List[int]:
+        """Frame numbers to render."""
+        count = len(self.generations)
+        if self.preview and count > PREVIEW_FRAMES:
+            # Always end on the last generation
+            return np.linspace(0, count - 1, PREVIEW_FRAMES).round().astype(int).tolist()
+        return list(range(count))
 
     def save_animation(self):
-        """Save the animation to a file."""
-        def animate(frame):
-            win_rate = self.play_generation(frame)
-            self.update_plot(frame + 1, win_rate)
-            return self.line,
-
-        ani = FuncAnimation(
-            self.fig, animate, frames=self.generation_count, interval=200, blit=True
-        )
-        ani.save(self.save_path, writer="ffmpeg")
+        """Render every frame and save the animation to a file."""
+        dpi = PREVIEW_DPI if self.preview else DPI
+        fig, _ = _draw_figure(self.generations, dpi)
+        width, height = fig.canvas.get_width_height()
+        plt.close(fig)
+
+        frames = self.frames()
+        if not frames:
+            raise ValueError("There are no generations to render.")
+        tasks = [frames[i:i + FRAMES_PER_TASK] for i in range(0, len(frames), FRAMES_PER_TASK)]
+        with Pool(self.workers, _init_worker, (self.generations, self.win_rates, dpi)) as pool:
+            rendered = _render_in_order(pool, tasks, self.workers * TASKS_PER_WORKER)
+            if self.save_path.endswith('.gif'):
+                # The last frame holds every colour in the video, so its palette serves all frames
+                last = pool.apply(_render_frames, ([frames[-1]],))[0]
+                palette = Image.frombuffer('RGBA', (width, height), last).convert('RGB').quantize(64)
+                self._save_gif(rendered, width, height, palette)
+            else:
+                self._save_video(rendered, width, height)
         print(f"Visualization saved to {self.save_path}")
 
+    def _save_video(self, rendered, width: int, height: int) -> None:
+        if shutil.which('ffmpeg') is None:
+            raise RuntimeError("ffmpeg is needed to save videos; save as .gif to render without it.")
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f"{width}x{height}", '-r', str(self.fps), '-i', '-',
+            # H.264 in yuv420p needs even dimensions
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', self.save_path,
+        ]
+        encoder = subprocess.Popen(command, stdin=subprocess.PIPE)
+        try:
+            for images in rendered:
+                encoder.stdin.writelines(images)
+        finally:
+            encoder.stdin.close()
+            if encoder.wait() != 0:
+                raise RuntimeError(f"ffmpeg failed with exit code {encoder.returncode}.")
 
-# Example usage
-if __name__ == "__main__":
-    # Total number of generations
-    generation_count = 1000
-    
-    # Number of episodes per generation
-    episode_count = 100000
+    def _save_gif(self, rendered, width: int, height: int, palette: Image.Image) -> None:
+        """
+        Write the frames to a looping GIF as they arrive. Each frame is quantized to the shared
+        palette and only the region that changed since the previous frame is encoded, so no more
+        than the previous frame is kept.
+        :param palette: Image whose palette every frame is quantized to.
+        """
+        duration = 1000 // self.fps
+        with open(self.save_path, 'wb') as f:
+            header, _ = GifImagePlugin.getheader(palette, info={'loop': 0, 'duration': duration})
+            f.writelines(header)
+            previous = None
+            for chunk in rendered:
+                for pixels in chunk:
+                    image = Image.frombuffer('RGBA', (width, height), pixels).convert('RGB')
+                    image = image.quantize(palette=palette, dither=Image.Dither.NONE)
+                    bbox = (0, 0, width, height)
+                    if previous is not None:
+                        # An unchanged frame still needs its duration, so it redraws a single pixel
+                        bbox = ImageChops.subtract_modulo(image, previous).getbbox(alpha_only=False) or (0, 0, 1, 1)
+                    f.writelines(GifImagePlugin.getdata(image.crop(bbox), bbox[:2], duration=duration))
+                    previous = image
+            f.write(b';') # Trailer
 
-    # Exploration rate
-    epsilon = 0.05
 
-    save_path = "training_visualization.mp4"  # File to save the animation
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render a training-curve video from recorded training data.")
+    parser.add_argument("--telemetry", type=str, help="Telemetry file written by --train --telemetry.")
+    parser.add_argument("--snapshots", type=str, help="Policy name of a run saved with --snapshot-every; its snapshots are evaluated.")
+    parser.add_argument("--episodes", type=int, default=100000, help="Hands to evaluate per snapshot. Default 100000.")
+    parser.add_argument("--decks", type=int, default=1, help="Number of decks for snapshot evaluation. Default 1.")
+    parser.add_argument("--seed", type=int, default=SNAPSHOT_SEED, help=f"Seed of the deals every snapshot is evaluated on. Default {SNAPSHOT_SEED}.")
+    parser.add_argument("--output", type=str, default="training_visualization.mp4", help="File to save the animation to (.gif is written without ffmpeg).")
+    parser.add_argument("--fps", type=int, default=5, help="Generations shown per second. Default 5.")
+    parser.add_argument("--preview", action="store_true", help=f"Render a quick low-resolution preview of at most {PREVIEW_FRAMES} frames.")
+    parser.add_argument("--workers", type=int, help="Number of rendering processes. Defaults to the number of CPUs.")
+    args = parser.parse_args()
 
-    visualizer = Visualizer(generation_count, episode_count, epsilon, save_path)
+    options = {'fps': args.fps, 'preview': args.preview, 'workers': args.workers}
+    if args.telemetry:
+        visualizer = Visualizer.from_telemetry(args.telemetry, args.output, **options)
+    elif args.snapshots:
+        names = [path[:-len(".mcpolicy")] for path in glob.glob(f"{glob.escape(args.snapshots)}.gen*.mcpolicy")]
+        visualizer = Visualizer.from_snapshots(names, args.episodes, args.decks, args.seed, args.output, **options)
+    else:
+        parser.error("Provide --telemetry or --snapshots.")
     visualizer.save_animation()
@@ -1,108 +1,281 @@
 import argparse
-from collections import deque
+from multiprocessing import Pool
 import os
+import time
+import numpy as np
 from Shoe import Shoe
 from Dealer import Dealer
 from Table import Table
 from Agent import Agent
 from Actions import Action
+from Checkpoint import save_checkpoint, load_checkpoint
+from Deals import create_deals, read_deals_header
+from Metrics import MetricsRegistry, metrics
 from MonteCarlo import MonteCarlo
+from Parallel import play_generation, evaluate_chunk, evaluation_shoe, evaluation_tasks
+from Rng import BufferedRandom
+from Stats import StreamingStats
+from Telemetry import TelemetryWriter
 from pprint import pprint
 
-def train_agent(episode_count: int, generation_count: int, epsilon: float, save_policy_name: str) -> None:
-    shoe=Shoe()
+def load_policy(policy: MonteCarlo, policy_name: str, mmap: bool = False) -> None:
+    """
+    Load a policy, preferring the binary .mcpolicy file (which also holds the visit counts)
+    over the legacy .MonteCarlo pickle.
+    """
+    if os.path.exists(f"{policy_name}.mcpolicy"):
+        policy.load_binary(policy_name, mmap)
+    else:
+        policy.load(policy_name)
+
+def training_record(generation: int, episodes: int, seats: int, elapsed: float, outcomes: tuple,
+                    policy: MonteCarlo, values_before: np.ndarray) -> dict:
+    """
+    Telemetry record for one training generation.
+    :param outcomes: Wins, losses and draws over every seat.
+    :param values_before: Copy of policy.values from the start of the generation.
+    """
+    wins, losses, draws = outcomes
+    greedy = policy.values.argmax(axis=2)
+    return {
+        'kind': 'train',
+        'generation': generation + 1,
+        'episodes': episodes,
+        'seats': seats,
+        'wall_time': elapsed,
+        'hands_per_sec': episodes / elapsed if elapsed else 0.0,
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'win_rate': wins / max(wins + losses + draws, 1),
+        # Visited states whose greedy action differs from the one played this generation
+        'policy_changes': int((greedy != policy.greedy)[policy.visited].sum()),
+        'max_q_delta': float(np.abs(policy.values - values_before).max()),
+    }
+
+def evaluation_record(results: StreamingStats, wins: int, losses: int, draws: int, elapsed: float, final: bool) -> dict:
+    """
+    Telemetry record for an evaluation run so far.
+    """
+    return {
+        'kind': 'eval',
+        'episodes': results.count,
+        'wall_time': elapsed,
+        'hands_per_sec': results.count / elapsed if elapsed else 0.0,
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'win_rate': wins / max(results.count, 1),
+        'window_score': results.window_mean(),
+        'final': final,
+    }
+
+def train_agent(episode_count: int, generation_count: int, epsilon: float, save_policy_name: str,
+                num_decks: int = 1, penetration: float = None, workers: int = None, seed: int = None,
+                checkpoint_every: int = None, checkpoint_seconds: float = None, resume: bool = False,
+                collect_metrics: bool = False, seats: int = 1, telemetry_path: str = None,
+                snapshot_every: int = None) -> None:
+    # The shoe and the exploration in update_actions draw from separate streams of the same seed.
+    rng = BufferedRandom(seed)
+    shoe_rng, policy_rng = rng.spawn(2)
+    shoe=Shoe(num_decks, penetration, rng=shoe_rng)
     dealer=Dealer(shoe)
+    # With several seats every hand yields a trajectory per seat. Each seat queues its rewards, and
+    # the policy applies the generation's queue before its next update_actions.
     table=Table(shoe,dealer)
-    policy=MonteCarlo()
+    policy=MonteCarlo(rng=policy_rng)
+
+    first_generation = 0
+    if resume and os.path.exists(f"{save_policy_name}.checkpoint"):
+        # Continue exactly where the checkpoint left off: same policy, RNG, shoe and seed.
+        checkpoint = load_checkpoint(save_policy_name, policy)
+        first_generation = checkpoint['generation']
+        shoe.rng.setstate(checkpoint['rng_state']['shoe'])
+        policy.rng.setstate(checkpoint['rng_state']['policy'])
+        shoe.setState(checkpoint['shoe_state'])
+        seed = checkpoint['seed']
+    elif os.path.exists(f"{save_policy_name}.mcpolicy") or os.path.exists(f"{save_policy_name}.MonteCarlo"):
+        load_policy(policy, save_policy_name)
+
+    for _ in range(seats):
+        table.add(Agent(policy))
 
-    if os.path.exists(f"{save_policy_name}.MonteCarlo"):
-        policy.load(save_policy_name)
+    # With workers or a seed, each generation is split into seeded chunks whose visit counts and
+    # rewards are merged into the policy, so the result is the same for any number of workers,
+    # including none (the chunks are then played in this process).
+    pool = None
+    if workers:
+        pool = Pool(workers)
+        if seed is None:
+            seed = rng.seed_sequence.entropy
+    chunked = seed is not None
 
-    table.add(Agent(policy))
+    # Created after the pool, so no worker is forked while the writer thread runs
+    telemetry = TelemetryWriter(telemetry_path) if telemetry_path else None
 
-    for generation in range(generation_count):
+    metrics.enabled = collect_metrics
+    last_checkpoint = time.monotonic()
+    for generation in range(first_generation, generation_count):
         print(f"Starting generation {generation+1}...")
         policy.update_actions(epsilon)
-        for _ in range(episode_count):
-            table.dealInitial()
-            table.playEpisode()
-            table.reset()
+        start = time.perf_counter()
+        values_before = policy.values.copy() if telemetry else None
+        if chunked:
+            outcomes = play_generation(pool, policy, episode_count, seed, generation, num_decks, penetration, seats)
+        else:
+            before = (table.wins, table.losses, table.draws)
+            for _ in range(episode_count):
+                table.dealInitial()
+                table.playEpisode()
+                table.reset()
+            # Apply the generation's queued rewards, so telemetry, snapshots and checkpoints see them
+            policy.flush_updates()
+            outcomes = (table.wins - before[0], table.losses - before[1], table.draws - before[2])
+        if telemetry:
+            telemetry.write(training_record(generation, episode_count, seats, time.perf_counter() - start,
+                                            outcomes, policy, values_before))
         print(f"Generation {generation+1} complete.")
+        if metrics.enabled:
+            print(MetricsRegistry.format(metrics.snapshot(reset=True)))
+
+        if snapshot_every is not None and (generation + 1) % snapshot_every == 0:
+            # Snapshots let Visualiser evaluate and plot the run after training has finished
+            policy.save_binary(f"{save_policy_name}.gen{generation + 1:05d}")
+
+        every_due = checkpoint_every is not None and (generation + 1) % checkpoint_every == 0
+        seconds_due = checkpoint_seconds is not None and time.monotonic() - last_checkpoint >= checkpoint_seconds
+        if every_due or seconds_due:
+            rng_state = {'shoe': shoe.rng.getstate(), 'policy': policy.rng.getstate()}
+            save_checkpoint(save_policy_name, policy, generation + 1, rng_state=rng_state,
+                            shoe_state=shoe.getState(), seed=seed)
+            last_checkpoint = time.monotonic()
+            print(f"Checkpoint saved to {save_policy_name}.checkpoint")
+
+    if pool:
+        pool.close()
+        pool.join()
+    if telemetry:
+        telemetry.close()
 
     policy.save(save_policy_name)
-    print(f"Training complete. Policy saved as '{save_policy_name}.MonteCarlo'")
+    policy.save_binary(save_policy_name)
+    print(f"Training complete. Policy saved as '{save_policy_name}.MonteCarlo' and '{save_policy_name}.mcpolicy'")
+
+def evaluate_agent(episodes:int, policy_name: str = None, num_decks: int = 1, penetration: float = None,
+                   workers: int = None, seed: int = None, collect_metrics: bool = False,
+                   telemetry_path: str = None, record_deals: str = None, replay_deals: str = None) -> None:
+    rng = BufferedRandom(seed)
+    metrics.enabled = collect_metrics
 
-def evaluate_agent(episodes:int, policy_name: str = None) -> None:
-    shoe = Shoe()
+    # Recording keeps every hand's cards, so other policies can later be evaluated on the same hands.
+    deals = None
+    if record_deals:
+        if penetration is not None:
+            raise ValueError("--record-deals needs a shoe refilled after every hand; drop --penetration.")
+        create_deals(record_deals, episodes, num_decks)
+        deals = (record_deals, True)
+    elif replay_deals:
+        num_decks, _, recorded = read_deals_header(replay_deals)
+        if recorded < episodes:
+            raise ValueError(f"{replay_deals} holds {recorded} hands, fewer than the {episodes} to evaluate.")
+        deals = (replay_deals, False)
+    # With workers each chunk records or replays its own hands, so only a serial run needs the file here.
+    serial_deals = (deals[0], 0, deals[1]) if deals is not None and not workers else None
+    shoe = evaluation_shoe(num_decks, penetration, rng, serial_deals)
     dealer=Dealer(shoe)
     table=Table(shoe, dealer)
     policy = MonteCarlo()
 
     if policy_name:
-        policy.load(policy_name)
-        print(f"Loaded policy from {policy_name}.MonteCarlo")
-    agent = Agent(policy)
+        load_policy(policy, policy_name, mmap=True)
+    # Evaluation only reads the on-policy actions, so the agent plays a frozen copy that ignores updates.
+    agent = Agent(policy.freeze())
     table.add(agent)
 
     # Track Stats
     wins = 0
     losses = 0
     draws = 0
-    win_rates = []
-    running_win_rate = []
 
+    # Results are scored 1 (win), 0.5 (draw) or 0 (loss). The history keeps a downsampled
+    # series of the running win rate without growing with the number of episodes.
     window_size = 1000
-    recent_results = deque(maxlen=window_size)
+    history_size = 1000
+    results = StreamingStats(window_size, history_size)
 
     print(f"\nEvaluating agent over {episodes} episodes...")
+    telemetry = None
+    start = time.perf_counter()
 
-    for episode in range(episodes):
-        table.dealInitial()
-        table.playEpisode()
-
-        agent_val = agent.calculateHand()
-        dealer_val = dealer.calculateHand()
-
-        if agent_val > 21:
-            losses += 1
-            recent_results.append(0)
-        elif dealer_val > 21:
-            wins += 1
-            recent_results.append(1)
-        elif agent_val > dealer_val:
-            wins += 1
-            recent_results.append(1)
-        elif agent_val < dealer_val:
-            losses += 1
-            recent_results.append(0)
-        else:
-            draws += 1
-            recent_results.append(0.5)
+    if workers:
+        # Each chunk plays with its own seeded shoe and a read-only copy of the policy. Chunks
+        # come back in order, so merging their stats extends the window as a serial run would.
+        if seed is None:
+            seed = rng.seed_sequence.entropy
+        tasks = evaluation_tasks(policy, episodes, seed, window_size, history_size, num_decks, penetration, deals)
+        with Pool(workers) as pool:
+            telemetry = TelemetryWriter(telemetry_path) if telemetry_path else None
+            for chunk_wins, chunk_losses, chunk_draws, chunk_results, chunk_metrics in pool.imap(evaluate_chunk, tasks):
+                if metrics.enabled:
+                    metrics.merge(chunk_metrics)
+                wins += chunk_wins
+                losses += chunk_losses
+                draws += chunk_draws
+                previous = results.count
+                results.merge(chunk_results)
+                if results.count * 10 // episodes > previous * 10 // episodes:
+                    print(f"Completed {results.count}/{episodes} episodes...")
+                    print(f"Current running win rate (last {window_size} episodes): {results.window_mean()*100:.1f}%")
+                    if telemetry and results.count < episodes:
+                        telemetry.write(evaluation_record(results, wins, losses, draws, time.perf_counter() - start, False))
+    else:
+        telemetry = TelemetryWriter(telemetry_path) if telemetry_path else None
+        progress_interval = max(episodes // 10, 1)
+        for episode in range(episodes):
+            table.dealInitial()
+            table.playEpisode()
 
-        # Calculate instantaneous win rate
-        current_win_rate = (wins / (episode + 1))*100
-        win_rates.append(current_win_rate)
+            agent_val = agent.calculateHand()
+            dealer_val = dealer.calculateHand()
 
-        # Running Avg with window
-        if episode < window_size:
-            running_avg = sum(recent_results) / len(recent_results) * 100
-        else:
-            running_avg = sum(recent_results) / window_size * 100
-        running_win_rate.append(running_avg)
+            if agent_val > 21:
+                losses += 1
+                results.add(0)
+            elif dealer_val > 21:
+                wins += 1
+                results.add(1)
+            elif agent_val > dealer_val:
+                wins += 1
+                results.add(1)
+            elif agent_val < dealer_val:
+                losses += 1
+                results.add(0)
+            else:
+                draws += 1
+                results.add(0.5)
+
+            table.reset()
 
-        table.reset()
+            # Progress update every 10% of episodes
+            if (episode + 1) % progress_interval == 0:
+                print(f"Completed {episode+1}/{episodes} episodes...")
+                print(f"Current running win rate (last {window_size} episodes): {results.window_mean()*100:.1f}%")
+                if telemetry and episode + 1 < episodes:
+                    telemetry.write(evaluation_record(results, wins, losses, draws, time.perf_counter() - start, False))
+        if serial_deals is not None:
+            shoe.close()
 
-        # Progress update every 10% of episodes
-        if (episode + 1) % (episodes // 10) == 0:
-            print(f"Completed {episode+1}/{episodes} episodes...")
-            print(f"Current running win rate (last {window_size} episodes): {running_avg:.1f}%")
+    if telemetry:
+        telemetry.write(evaluation_record(results, wins, losses, draws, time.perf_counter() - start, True))
+        telemetry.close()
 
     # Final win statistics
     total_games = wins+losses+draws
     win_rate = (wins/total_games)*100
     loss_rate = (losses/total_games)*100
     draw_rate = (draws/total_games)*100
-    final_running_avg = sum(recent_results) / len(recent_results) * 100
+    final_running_avg = results.window_mean() * 100
+    low, high = results.confidence_interval()
 
     print("\n===== Final Statistics =====")
     print(f"Total Games: {total_games}")
@@ -110,6 +283,14 @@ def evaluate_agent(episodes:int, policy_name: str = None) -> None:
     print(f"Losses: {losses} ({loss_rate:.1f}%)")
     print(f"Draws: {draws} ({draw_rate:.1f}%)")
     print(f"Final {window_size}-episode running win rate: {final_running_avg:.1f}%")
+    print(f"Average score (draws count half): {results.mean*100:.1f}% (95% CI {low*100:.1f}%-{high*100:.1f}%)")
+    if len(results.history) >= 10:
+        # The running win rate at the end of each tenth of the run, from the downsampled history
+        tenths = [results.history[(tenth + 1) * len(results.history) // 10 - 1] for tenth in range(10)]
+        print(f"Running win rate by tenth of the run: {' '.join(f'{rate*100:.1f}%' for rate in tenths)}")
+    if metrics.enabled:
+        print("\n===== Metrics =====")
+        print(MetricsRegistry.format(metrics.snapshot()))
 
     #print(agent.policy.policy)
     
@@ -120,8 +301,22 @@ if __name__ == "__main__":
     parser.add_argument("--eval", type=int, help="Evaluate an agent over the specified number of episodes.")
     parser.add_argument("--policy", type=str, help="Policy filename base (without extension) for saving or loading.")
     parser.add_argument("--inspect", type=str, help="Policy filename to inspect.")
+    parser.add_argument("--convert", choices=["binary", "pickle"], help="Convert the --policy file to the binary (.mcpolicy) or pickle (.MonteCarlo) format.")
     parser.add_argument("--gen", type=int, help="Number of generations to run. Default 50.")
     parser.add_argument("--epsilon", type=float, help="Probability of choosing a random action. Defualt 0.05 (5%).")
+    parser.add_argument("--decks", type=int, default=1, help="Number of decks in the shoe. Default 1.")
+    parser.add_argument("--penetration", type=float, help="Deal this fraction of the shoe before reshuffling, instead of refilling it after every hand.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes to spread training generations or evaluation over.")
+    parser.add_argument("--seed", type=int, help="Seed for the random number generator.")
+    parser.add_argument("--checkpoint-every", type=int, help="Save a training checkpoint every N generations.")
+    parser.add_argument("--checkpoint-seconds", type=float, help="Save a training checkpoint when this many seconds have passed since the last one.")
+    parser.add_argument("--metrics", action="store_true", help="Collect and print hot-path counters and phase timings.")
+    parser.add_argument("--resume", action="store_true", help="Continue training from the --policy checkpoint, if there is one.")
+    parser.add_argument("--seats", type=int, default=1, help="Number of training seats sharing the policy and one shoe. Default 1.")
+    parser.add_argument("--snapshot-every", type=int, help="Save a binary policy snapshot (<policy>.gen<N>.mcpolicy) every N generations.")
+    parser.add_argument("--record-deals", type=str, help="Record the hands dealt during --eval to this deal file. Not available with --penetration.")
+    parser.add_argument("--deals", type=str, help="Evaluate on the hands of a deal file recorded with --record-deals, instead of new random hands. The file sets the number of decks.")
+    parser.add_argument("--telemetry", type=str, help="Append per-generation (or evaluation progress) records to this file: CSV for a .csv path, JSON lines otherwise.")
     args = parser.parse_args()
 
     if args.gen:
@@ -140,12 +335,26 @@ if __name__ == "__main__":
         else:
             print(generations)
             print(epsilon)
-            train_agent(args.train, generations, epsilon, args.policy)
+            train_agent(args.train, generations, epsilon, args.policy, args.decks, args.penetration,
+                        args.workers, args.seed, args.checkpoint_every, args.checkpoint_seconds, args.resume,
+                        args.metrics, args.seats, args.telemetry, args.snapshot_every)
     elif args.eval:
-        evaluate_agent(args.eval, args.policy)
+        evaluate_agent(args.eval, args.policy, args.decks, args.penetration, args.workers, args.seed, args.metrics,
+                       args.telemetry, args.record_deals, args.deals)
     elif args.inspect:
         policy = MonteCarlo()
-        policy.load(args.inspect)
+        load_policy(policy, args.inspect, mmap=True)
         pprint(policy.actions)
+    elif args.convert:
+        if not args.policy:
+            print("Please provide a policy name with --policy to convert.")
+        elif args.convert == "binary":
+            policy = MonteCarlo()
+            policy.load(args.policy)
+            policy.save_binary(args.policy)
+        else:
+            policy = MonteCarlo()
+            policy.load_binary(args.policy)
+            policy.save(args.policy)
     else:
         print("Please specify --train or --play along with necessary arguments.")